@@ -0,0 +1,108 @@
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import time
+import numpy as np
+import evaluation
+from evaluation import build_sources
+from scenario import Scenario
+from synthetic_data import load_synthetic_data, make_individual, make_population
+from time_axis import HOURS_PER_YEAR
+
+# Scaling matrix, every combination is timed: fleets as (non BESS units, BESS units),
+# number of simulated years (1 .. 12, from year 1) and GA population sizes.
+FLEETS = [(4, 0), (8, 6), (16, 12)]
+YEARS = [1, 4, 12]
+POPULATIONS = [4, 16]
+# failures per unit and year for every source type, None keeps the synthetic defaults
+NUM_ANNUAL_FAILS = None
+SEED = 0
+OUTPUT_FILE = 'data/benchmark_results.json'
+
+SCENARIO_PARAMS = dict(
+    name="Benchmark",
+    client_name="Synthetic",
+    spin_reserve_perc=0,
+    bess_non_emergency_use=2,
+    bess_charge_hours=1,
+    bess_priority_wise_use=True,
+    charge_ratio_night=2.5,
+)
+
+
+def timed(func, *args, **kwargs):
+    # (result, wall seconds) of one call, the simulation's own progress prints are swallowed
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        return result, time.perf_counter() - start
+
+
+def benchmark_scenario(units, bess_units, years, seed=SEED):
+    """
+    Times Source.configure for the fleet, then Scenario.simulate and aggregate_data_for_reporting
+    in both reporting and kpi_only mode. simulate includes its own aggregation pass, so the
+    dispatch time is simulate minus aggregate.
+    """
+    simulated_years = range(1, years + 1)
+    individual = make_individual(units, bess_units, seed)
+    fleet = {'units': units, 'bess_units': bess_units, 'years': years}
+    records = []
+
+    for kpi_only in (False, True):
+        src_list, configure_time = timed(build_sources, individual, seed)
+        sc = Scenario(selected_sources=src_list, kpi_only=kpi_only, **SCENARIO_PARAMS)
+        _, simulate_time = timed(sc.simulate, simulated_years)
+        _, aggregate_time = timed(sc.aggregate_data_for_reporting)
+        mode = 'kpi_only' if kpi_only else 'reporting'
+        records.append({'phase': 'configure', 'mode': mode, **fleet, 'sources': len(src_list), 'seconds': configure_time})
+        records.append({'phase': 'simulate', 'mode': mode, **fleet, 'sources': len(src_list), 'seconds': simulate_time,
+                        'hours_per_second': years * HOURS_PER_YEAR / simulate_time})
+        records.append({'phase': 'aggregate', 'mode': mode, **fleet, 'sources': len(src_list), 'seconds': aggregate_time})
+    return records
+
+
+def benchmark_generation(units, bess_units, years, population_size, seed=SEED):
+    # One GA generation: evaluating population_size chromosomes serially, without the fitness cache
+    population = make_population(population_size, units, bess_units, seed)
+    with evaluation.Evaluator(SCENARIO_PARAMS, data_folder=None, seed=seed, cache_size=0) as evaluator:
+        _, seconds = timed(evaluator.run, population, range(1, years + 1))
+    return {'phase': 'generation', 'mode': 'kpi_only', 'units': units, 'bess_units': bess_units, 'years': years,
+            'population': population_size, 'seconds': seconds, 'individuals_per_second': population_size / seconds}
+
+
+def run_benchmarks(fleets=FLEETS, years=YEARS, populations=POPULATIONS, output_file=OUTPUT_FILE,
+                   num_annual_fails=NUM_ANNUAL_FAILS, seed=SEED):
+
+    load_synthetic_data(seed=seed, num_annual_fails=num_annual_fails)
+    records = []
+    for units, bess_units in fleets:
+        for n_years in years:
+            print(f'Benchmarking {units} units + {bess_units} BESS over {n_years} year(s)')
+            records.extend(benchmark_scenario(units, bess_units, n_years, seed))
+            for population_size in populations:
+                records.append(benchmark_generation(units, bess_units, n_years, population_size, seed))
+
+    report = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__,
+                        'platform': platform.platform(), 'cpu_count': os.cpu_count()},
+        'settings': {'fleets': fleets, 'years': years, 'populations': populations,
+                     'num_annual_fails': num_annual_fails, 'seed': seed},
+        'results': records,
+    }
+    if output_file:
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+        with open(output_file, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f'Benchmark results written to {output_file}')
+    return report
+
+
+if __name__ == "__main__":
+    report = run_benchmarks()
+    for record in report['results']:
+        print(record)
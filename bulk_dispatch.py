@@ -0,0 +1,181 @@
+import numpy as np
+from dispatch_plan import Fleet
+from project import Project
+from time_axis import HOURS_PER_YEAR, year_slice
+
+
+def bulk_dispatch_supported(scenario):
+    # The bulk path only reproduces plain merit order loading. Spinning reserve and priority
+    # groups that mix BESS with other sources keep the whole run on the hourly path.
+    if scenario.spinning_reserve_perc != 0 and scenario.plan.spin_reserve_groups:
+        return False
+    for group in scenario.plan.priority_groups:
+        if any(src.spec.is_bess != group.is_bess for src in group.sources):
+            return False
+    return True
+
+
+class BulkDispatch:
+    """
+    Dispatch of the event free hours of one simulation year, worked out for the whole year at once.
+
+    An hour is event free when no source fails or drops output, every BESS is either out or idle
+    at full charge, and the non BESS groups ranked ahead of the first BESS group cover the whole
+    load. Such an hour never touches the BESS, never charges it and has nothing to log, so its
+    dispatch depends only on the seeded status and capacity arrays and gives exactly what
+    Scenario.calc_src_power_and_energy2 would. Scenario.simulate hands each hour to dispatch(),
+    which fills in the stretch of event free hours starting there, and runs the hourly path for
+    everything else.
+    """
+
+    def __init__(self, scenario, y, year_power_req=None, simulated_hours=None):
+        self.bess_sources = scenario.bess_sources
+        # (hourly arrays, whether they are stacked fleet arrays) of each BESS unit or fleet
+        self.bess_stores = tuple((src.store, True) if isinstance(src, Fleet) else (src.ops_data, False)
+                                 for src in scenario.plan.bess_units)
+        self.first_hour = (y - 1) * HOURS_PER_YEAR
+        hours = year_slice(y)
+
+        quiet = np.ones(HOURS_PER_YEAR, dtype=bool)
+        for src in scenario.src_list:
+            status = src.ops_data.status[hours]
+            quiet &= (status != -1) & (status != 0.5)
+
+        # Merit order loading of the groups ahead of the first BESS group, same steps as the
+        # hourly path but for all hours of the year side by side.
+        if year_power_req is None:
+            year_power_req = Project.profile_to_array(Project.load_data[y])
+        rem_power_req = year_power_req.copy()
+        searching = np.ones(HOURS_PER_YEAR, dtype=bool)
+        # (source, hours it is loaded, power output in those hours)
+        self.loaded_sources = []
+        for group in scenario.plan.priority_groups:
+            if group.is_bess:
+                break
+
+            grp_potential_output = np.zeros(HOURS_PER_YEAR)
+            adding = searching.copy()
+            can_provide = []
+            for src in group.sources:
+                capacity = src.ops_data.capacity[hours]
+                status = src.ops_data.status[hours]
+                provides = adding & (status != -2) & (status != -3) & ~(capacity <= 0)
+                grp_potential_output = np.where(provides, grp_potential_output + capacity, grp_potential_output)
+                adding &= ~(provides & (grp_potential_output > rem_power_req))
+                can_provide.append(provides)
+
+            dispatched = searching & (grp_potential_output > 0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                loading_factor = np.minimum(rem_power_req / grp_potential_output, 1)
+            group_actual_output = np.zeros(HOURS_PER_YEAR)
+            for src, provides in zip(group.sources, can_provide):
+                loaded = dispatched & provides
+                if not loaded.any():
+                    continue
+                power_output = loading_factor * src.ops_data.capacity[hours]
+                group_actual_output = np.where(loaded, group_actual_output + power_output, group_actual_output)
+                self.loaded_sources.append((src, loaded, power_output))
+
+            rem_power_req = np.where(dispatched, np.maximum(rem_power_req - group_actual_output, 0), rem_power_req)
+            rem_power_req[dispatched & (rem_power_req < 0.01)] = 0
+            searching &= rem_power_req != 0
+
+        self.event_free = quiet & ~searching
+        if simulated_hours is not None:
+            #stretches must not run into hours the scenario skips (representative day runs)
+            self.event_free &= simulated_hours
+
+        # Inside a stretch a BESS has to stay out, or stay idle with the same capacity so the
+        # full reserve it carries over from the previous hour still needs no charging.
+        bess_steady = np.ones(HOURS_PER_YEAR, dtype=bool)
+        for src in self.bess_sources:
+            status = src.ops_data.status[hours]
+            capacity = src.ops_data.capacity[hours]
+            prev_status = self.previous_hours(src.ops_data.status)
+            prev_capacity = self.previous_hours(src.ops_data.capacity)
+            bess_steady &= (status == -2) | (status == -3) | \
+                ((status == 0) & (prev_status == 0) & (capacity == prev_capacity))
+
+        # Hours (within the year) where a stretch has to end.
+        self.stretch_breaks = np.flatnonzero(~(self.event_free & bess_steady))
+
+    def previous_hours(self, values):
+        # Value in the hour before each hour of the year, the first hour of the run counts as its own previous hour.
+        prev = values[max(self.first_hour - 1, 0):self.first_hour + HOURS_PER_YEAR - 1]
+        return prev if self.first_hour > 0 else np.concatenate((values[:1], prev))
+
+    def bess_ready(self, i):
+        # Whether every BESS starts hour i out of service or idle at full charge, given the state
+        # the previous hour left behind. Hour 0 starts from the initial full reserve.
+        for ops_data, stacked in self.bess_stores:
+            if stacked:
+                if not self.fleet_ready(ops_data, i):
+                    return False
+                continue
+            status = ops_data.status[i]
+            if status == -2 or status == -3:
+                continue
+            if status != 0:
+                return False
+            prev = i - 1 if i > 0 else i
+            if i > 0 and ops_data.status[prev] not in (0, 1, 2):
+                return False
+            if ops_data.reserve[prev] != ops_data.capacity[i]:
+                return False
+        return True
+
+    @staticmethod
+    def fleet_ready(store, i):
+        # bess_ready for the members of a fleet, on the columns of hour i and the hour before
+        prev = i - 1 if i > 0 else i
+        prev_status = store.status[:, prev].tolist()
+        prev_reserve = store.reserve[:, prev].tolist()
+        capacity = store.capacity[:, i].tolist()
+        for n, status in enumerate(store.status[:, i].tolist()):
+            if status == -2 or status == -3:
+                continue
+            if status != 0:
+                return False
+            if i > 0 and prev_status[n] not in (0, 1, 2):
+                return False
+            if prev_reserve[n] != capacity[n]:
+                return False
+        return True
+
+    def dispatch(self, i):
+        """
+        Dispatch the stretch of event free hours starting at absolute hour i, up to the end of
+        the year at most. Returns the hour after the stretch, or i itself if hour i has to go
+        through the hourly path.
+        """
+        t = i - self.first_hour
+        if not self.event_free[t] or not self.bess_ready(i):
+            return i
+
+        next_break = np.searchsorted(self.stretch_breaks, t, side='right')
+        end = self.stretch_breaks[next_break] if next_break < len(self.stretch_breaks) else HOURS_PER_YEAR
+        stretch = slice(t, end)
+        hours = slice(i, self.first_hour + end)
+
+        for src, loaded, power_output in self.loaded_sources:
+            loaded = loaded[stretch]
+            if not loaded.any():
+                continue
+            ops_data = src.ops_data
+            power_output = power_output[stretch][loaded]
+            ops_data.power_output[hours][loaded] = power_output
+            ops_data.energy_output[hours][loaded] = power_output
+            ops_data.reserve[hours][loaded] = ops_data.capacity[hours][loaded] - power_output
+            ops_data.status[hours][loaded] = 1
+
+        for ops_data, stacked in self.bess_stores:
+            # a fleet's members side by side, one row each
+            window = (slice(None), hours) if stacked else hours
+            status = ops_data.status[window]
+            out = (status == -2) | (status == -3)
+            ops_data.capacity[window][out] = 0
+            ops_data.reserve[window][out] = 0
+            idle = status == 0
+            ops_data.reserve[window][idle] = ops_data.capacity[window][idle]
+
+        return self.first_hour + end
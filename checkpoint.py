@@ -0,0 +1,26 @@
+import gzip
+import os
+import pickle
+
+# Bumped whenever the checkpoint layout changes, older files are refused rather than misread.
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(filepath, **state):
+    # Written to a temporary file first so a run killed mid write keeps its previous checkpoint.
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    temp_path = f"{filepath}.{os.getpid()}.tmp"
+    with gzip.open(temp_path, 'wb') as checkpoint_file:
+        pickle.dump({'version': CHECKPOINT_VERSION, **state}, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, filepath)
+
+
+def load_checkpoint(filepath):
+    # The saved state, or None when there is no checkpoint to resume from.
+    if not os.path.exists(filepath):
+        return None
+    with gzip.open(filepath, 'rb') as checkpoint_file:
+        state = pickle.load(checkpoint_file)
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Checkpoint {filepath} has version {state.get('version')}, expected {CHECKPOINT_VERSION}")
+    return state
@@ -0,0 +1,176 @@
+from collections import namedtuple
+from itertools import groupby
+import numpy as np
+from ops_store import FleetStore
+
+# A group of sources dispatched together. key is the priority or block load acceptance the group
+# was formed on, members are indices into Scenario.src_list and sources the matching Source objects.
+# units are the same sources in the same order, with each fleet among them as one Fleet.
+# The remaining fields describe the first member, which is what the dispatch rules look at for the
+# whole group.
+SourceGroup = namedtuple('SourceGroup', ['key', 'members', 'sources', 'units', 'is_bess', 'spinning_reserve', 'generic_name'])
+
+# Config entries the dispatch looks at. Units of one type that agree on all of them only differ
+# in their start year and failure draws, i.e. in which hours they are available.
+FLEET_CONFIG_KEYS = ('rating', 'priority', 'min_loading', 'max_loading', 'spinning_reserve')
+# Smallest run of identical units dispatched as a fleet. Shorter runs split too often for the
+# run bookkeeping to pay off and are faster dispatched unit by unit.
+FLEET_MIN_UNITS = 4
+
+
+def block_load_acceptance(src):
+    return src.spec.block_load_acceptance
+
+
+def fleet_key(src):
+    return (src.spec.name,) + tuple(src.config[key] for key in FLEET_CONFIG_KEYS)
+
+
+def add_members(total, value, count):
+    # total with value added once per member of a run, one addition at a time as unit by unit
+    # dispatch does it, so the sum rounds exactly the same way
+    for _ in range(count):
+        total += value
+    return total
+
+
+def step_members(count, total, step, stops):
+    """
+    Walk a dispatch rule over a run of count identical units one member at a time, with the same
+    arithmetic as unit by unit. step(total) gives what the next member gets, e.g. its contribution,
+    and the total after it. The rule stops after the first member for which stops(total) holds,
+    and a step ends before a member that would get something else than the first one. Returns
+    the number of members in the step, what each of them gets and the total after them.
+    """
+    value, total = step(total)
+    n = 1
+    while n < count and not stops(total):
+        next_value, next_total = step(total)
+        if next_value != value:
+            break
+        total = next_total
+        n += 1
+    return n, value, total
+
+
+class Fleet:
+    """
+    Identical units, same source type and dispatch config, next to each other in src_list.
+
+    The hourly dispatch reads a fleet's hour from store, a FleetStore over the members' ops data,
+    as runs of members in the same state and applies the per unit rules to each run once. Group
+    totals still take every member in turn (add_members, step_members) and a run is split where
+    members have to be treated differently, so members are taken in src_list order and results are
+    the same as unit by unit, per unit results staying in each member's own ops_data. unit is the
+    first member, standing in for all of them for the type and config. block is the stacked array
+    for store, e.g. from a StatePool.
+    """
+
+    def __init__(self, members, sources, block=None):
+        self.members = members
+        self.sources = sources
+        self.count = len(members)
+        self.unit = sources[0]
+        self.store = FleetStore([src.ops_data for src in sources], block)
+
+
+class DispatchPlan:
+    """
+    Source groupings used by the hourly dispatch, worked out once per Scenario.
+
+    src_list must already be sorted by priority and must not be reordered afterwards,
+    all groups refer to sources by their position in it. Runs of at least FLEET_MIN_UNITS
+    identical units become fleets, which stacks their hourly arrays (see FleetStore) in blocks
+    taken from state_pool when given. fleets False dispatches every unit on its own.
+    """
+
+    def __init__(self, src_list, state_pool=None, fleets=True):
+
+        self.src_list = src_list
+        self.fleets = []
+        for _, members in groupby(range(len(src_list)), key=lambda i: fleet_key(src_list[i])):
+            members = tuple(members)
+            if fleets and len(members) >= FLEET_MIN_UNITS:
+                block = None if state_pool is None else state_pool.acquire_block(len(members))
+                self.fleets.append(Fleet(members, tuple(src_list[i] for i in members), block))
+        self.fleet_at = {fleet.members[0]: fleet for fleet in self.fleets}
+        # every source once, fleets as one unit
+        self.units = self.unit_list(range(len(src_list)))
+
+        self.priority_groups = self._group(src_list, range(len(src_list)), lambda src: src.config['priority'])
+
+        # Non BESS groups that have to hold spinning reserve by running at minimum loading
+        self.spin_reserve_groups = tuple(group for group in self.priority_groups
+                                         if not group.is_bess and group.spinning_reserve != 0)
+
+        self.bess = tuple(i for i, src in enumerate(src_list) if src.spec.is_bess)
+        self.non_bess = tuple(i for i, src in enumerate(src_list) if not src.spec.is_bess)
+        self.bess_units = self.unit_list(self.bess)
+        self.non_bess_units = self.unit_list(self.non_bess)
+
+        # Groups that can pick up a sudden power drop, highest block load acceptance first.
+        # Zero acceptance groups (e.g. solar) never respond and are left out.
+        by_acceptance = sorted(range(len(src_list)), key=lambda i: block_load_acceptance(src_list[i]), reverse=True)
+        self.block_acceptance_groups = tuple(group for group in self._group(src_list, by_acceptance, block_load_acceptance)
+                                             if group.key != 0)
+
+    def unit_list(self, members):
+        # members (indices in src_list order) as Sources, with the members of a fleet replaced by the Fleet.
+        # A fleet's units share type and config, so they always land in the same groups, next to each other.
+        units = []
+        members = tuple(members)
+        n = 0
+        while n < len(members):
+            fleet = self.fleet_at.get(members[n])
+            if fleet is None:
+                units.append(self.src_list[members[n]])
+                n += 1
+            else:
+                units.append(fleet)
+                n += fleet.count
+        return tuple(units)
+
+    def _group(self, src_list, order, key):
+        groups = []
+        for value, members in groupby(order, key=lambda i: key(src_list[i])):
+            members = tuple(members)
+            first = src_list[members[0]]
+            groups.append(SourceGroup(
+                key=value,
+                members=members,
+                sources=tuple(src_list[i] for i in members),
+                units=self.unit_list(members),
+                is_bess=first.spec.is_bess,
+                spinning_reserve=first.config['spinning_reserve'],
+                generic_name=first.spec.generic_name,
+            ))
+        return tuple(groups)
+
+
+def fleet_dispatch_mismatches(fleet_run, unit_run):
+    """
+    Check of a run with fleets against the same sources run unit by unit (Scenario fleets=False),
+    built with the same seed: the hourly arrays of every source, the hourly results, the event log,
+    the yearly totals and the KPIs (once calculated), named where they differ. Fleets must not change
+    any result, so the list should be empty.
+    """
+    mismatches = []
+    for n, (fleet_src, unit_src) in enumerate(zip(fleet_run.src_list, unit_run.src_list)):
+        for field, values in fleet_src.ops_data.hour_fields.items():
+            if not np.array_equal(values, unit_src.ops_data.hour_fields[field], equal_nan=True):
+                mismatches.append(f'{n} {fleet_src.name} {field}')
+    if fleet_run.hourly_results is not None and unit_run.hourly_results is not None:
+        for field, values in fleet_run.hourly_results.hour_fields.items():
+            if not np.array_equal(values, unit_run.hourly_results.hour_fields[field], equal_nan=True):
+                mismatches.append(f'hourly_results {field}')
+    if fleet_run.event_log is not None and unit_run.event_log is not None:
+        if not np.array_equal(fleet_run.event_log.codes, unit_run.event_log.codes) or \
+                fleet_run.event_log.details != unit_run.event_log.details:
+            mismatches.append('event_log')
+    for year, totals in fleet_run.year_totals.items():
+        if totals != unit_run.year_totals.get(year):
+            mismatches.append(f'year_totals {year}')
+    for kpi, value in fleet_run.scenario_kpis.items():
+        if value != unit_run.scenario_kpis.get(kpi) and value == value:
+            mismatches.append(kpi)
+    return mismatches
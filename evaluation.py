@@ -0,0 +1,238 @@
+import math
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from project import Project
+from ops_store import StatePool
+from scenario import Scenario
+from sources2 import SourceManager
+
+# Start gene of each source block in a chromosome: [quantity, priority, start year per unit ...]
+GENE_BEGIN = [0, 3, 9, 36, 39, 43]
+GENOME_LENGTH = 53
+
+# Loaded once per process by load_prereq_data, either in the main process for serial runs
+# or by the pool initializer in every worker.
+source_manager = None
+# OpsStore / ResultsStore buffers reused from one evaluation to the next, one pool per process
+state_pool = StatePool()
+
+
+def load_prereq_data(data_folder='data'):
+    global source_manager
+    print('Reading Pre req data')
+    Project.read_load_projection(data_folder)
+    Project.read_load_solar_data_from_folder(os.path.join(data_folder, 'load_solar_profile'))
+    Project.create_load_data()
+    source_manager = SourceManager(os.path.join(data_folder, 'input_data.xlsx'))
+
+
+def canonical_genome(individual):
+    """
+    Reduce a chromosome to the part that changes the simulation: per source block the unit
+    count, the priority (only if there are units) and the sorted start years of the units
+    that exist. Start year slots past the unit count are ignored.
+    """
+    blocks = []
+    for i, begin in enumerate(GENE_BEGIN):
+        end = GENE_BEGIN[i+1] if i+1 < len(GENE_BEGIN) else GENOME_LENGTH
+        qty = int(individual[begin])
+        if qty == 0:
+            blocks.append((0, None, ()))
+            continue
+        start_years = tuple(sorted(int(gene) for gene in individual[begin+2:min(begin+2+qty, end)]))
+        blocks.append((qty, int(individual[begin+1]), start_years))
+    return tuple(blocks)
+
+
+def build_sources(individual, seed=None, stats=None, pool=None, keep_configured=False):
+
+    #configure(self, start_year, end_year,rating, rating_unit,
+    #spin_reserve, priority, min_loading, max_loading):
+    #units are built from the canonical genome so that equal canonical forms give identical source lists
+    sources = []
+    for i, (qty, priority, start_years) in enumerate(canonical_genome(individual)):
+        for start_year in start_years:
+            src = source_manager.get_source_types_by_name('SRC_'+str(i+1))
+            #each unit gets its own failure stream, derived from the run seed when one is given
+            unit_seed = None if seed is None else [seed, len(sources)]
+            #with a SimulationStats the configure calls are timed into it, keep_configured is for sources that get reseeded
+            configure = src.configure if stats is None else stats.timed('Source.configure', src.configure)
+            configure(start_year=start_year, end_year = 12,rating=5, rating_unit='MWh', spin_reserve=0,
+                      priority=priority, min_loading=0, max_loading=100, seed=unit_seed, pool=pool,
+                      keep_configured=keep_configured)
+            sources.append(src)
+    return sources
+
+
+def evaluate_individual(individual, scenario_params, seed=None, years=None):
+
+    #only the KPIs are read back, so skip hourly retention and reporting unless scenario_params asks otherwise
+    #the scenario's buffers go back to state_pool once the KPIs are read
+    src_list = build_sources(individual, seed, pool=state_pool)
+    sc = Scenario(selected_sources=src_list, state_pool=state_pool, **{'kpi_only': True, **scenario_params})
+    sc.simulate(years)
+    if not sc.kpi_only:
+        sc.aggregate_power_output_by_source_and_year()
+    state_pool.release_scenario(sc)
+    return sc.scenario_kpis
+
+
+class FitnessCache:
+    """
+    Bounded LRU cache of scenario_kpis keyed on canonical genome plus evaluation settings.
+    maxsize 0 disables caching.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(individual, scenario_params, seed=None):
+        # name and client_name only label the Scenario, every other parameter changes dispatch
+        dispatch_params = tuple(sorted((k, v) for k, v in scenario_params.items() if k not in ('name', 'client_name')))
+        return canonical_genome(individual), dispatch_params, seed
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, kpis):
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = kpis
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def dump(self):
+        # (key, kpis) pairs, least recently used first, e.g. for a checkpoint
+        return list(self.entries.items())
+
+    def load(self, entries):
+        for key, kpis in entries:
+            self.put(key, kpis)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0,
+            'size': len(self.entries),
+        }
+
+
+class Evaluator:
+    """
+    Evaluates a GA population and returns one scenario_kpis dict per individual, in population order.
+
+    With workers > 1 a generation is fanned out over a process pool whose workers load the
+    Project and SourceManager data once at start up. workers <= 1 evaluates serially in this
+    process. Individuals whose canonical genome was already evaluated (in an earlier generation
+    or earlier in the same one) are served from the fitness cache instead of being simulated.
+    seed is the run seed handed to build_sources for every evaluation, in this process and in
+    the workers alike, so results are reproducible. None draws a fresh realisation each time.
+
+    racing_levels turns on multi fidelity racing, see race(). Each level is a tuple of years
+    to simulate as a cheap proxy, from cheapest to dearest, score ranks candidates at every
+    level (lower is better, e.g. the GA fitness). data_folder None evaluates serially against
+    the data already loaded in this process, e.g. by synthetic_data.load_synthetic_data.
+    Use as a context manager, or call close(), to shut the pool down.
+    """
+
+    def __init__(self, scenario_params, data_folder='data', workers=None, seed=None, cache_size=1024,
+                 racing_levels=None, keep_fraction=1/3, score=None):
+        if racing_levels and score is None:
+            raise ValueError("Racing needs a score function to rank candidates")
+        self.scenario_params = scenario_params
+        self.data_folder = data_folder
+        self.workers = os.cpu_count() if workers is None else workers
+        self.seed = seed
+        self.racing_levels = tuple(tuple(years) for years in racing_levels) if racing_levels else ()
+        self.keep_fraction = keep_fraction
+        self.score = score
+        self.cache = FitnessCache(cache_size)
+        self.executor = None
+
+        if data_folder is None:
+            self.workers = 1
+        elif self.workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=load_prereq_data, initargs=(data_folder,))
+        else:
+            load_prereq_data(data_folder)
+
+    def evaluate(self, population):
+
+        keys = [FitnessCache.key(individual, self.scenario_params, self.seed) for individual in population]
+        results = {}
+        pending = {}
+        for key, individual in zip(keys, population):
+            if key in results or key in pending:
+                #duplicate inside this generation, simulated once
+                self.cache.hits += 1
+                continue
+            kpis = self.cache.get(key)
+            if kpis is None:
+                pending[key] = individual
+            else:
+                results[key] = kpis
+
+        candidates = list(pending.values())
+        for key, kpis in zip(pending, self.race(candidates) if self.racing_levels else self.run(candidates)):
+            #candidates dropped early in a race are left out of the cache, only full runs are reused
+            if kpis.get('Racing Level', len(self.racing_levels)) == len(self.racing_levels):
+                self.cache.put(key, kpis)
+            results[key] = kpis
+
+        return [dict(results[key]) for key in keys]
+
+    def race(self, population):
+        """
+        Successive halving over the racing levels. Every candidate runs on the first level, the
+        best keep_fraction of them by score go on to the next level and so on; only the survivors
+        of the last level get the full simulation. Each candidate keeps the scenario_kpis of the
+        last run it got, with 'Racing Level' set to the number of levels it passed, so
+        len(racing_levels) marks a full run. The KPIs of dropped candidates only cover the years
+        of their last level and must not be ranked against full runs.
+        """
+        results = [None] * len(population)
+        contenders = list(range(len(population)))
+        for level, years in enumerate(self.racing_levels + (None,)):
+            for n, kpis in zip(contenders, self.run([population[n] for n in contenders], years)):
+                kpis['Racing Level'] = level
+                results[n] = kpis
+            if years is None:
+                break
+            keep = max(1, math.ceil(len(contenders) * self.keep_fraction))
+            contenders = sorted(contenders, key=lambda n: self.score(results[n]))[:keep]
+        return results
+
+    def run(self, population, years=None):
+
+        if self.executor is None:
+            return [evaluate_individual(individual, self.scenario_params, self.seed, years) for individual in population]
+
+        n = len(population)
+        # Small chunks keep all workers busy, the pool returns results in submission order.
+        chunksize = max(1, n // (4 * self.workers))
+        return list(self.executor.map(evaluate_individual, population, [self.scenario_params] * n, [self.seed] * n, [years] * n,
+                                      chunksize=chunksize))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
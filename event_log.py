@@ -0,0 +1,76 @@
+import numpy as np
+from time_axis import NUM_HOURS
+
+# Event flags, OR-ed together into the code of an hour. Code 0 is normal operation.
+UNSERVED = 1
+FAILURE = 2
+REDUCTION = 4
+LOAD_SHED = 8
+
+
+def source_label(src):
+    return f"{src.config['rating']} {src.config['rating_unit']} {src.name}"
+
+
+class EventLog:
+    """
+    Compact hourly operations log of a Scenario.
+
+    Every hour gets an integer event code. Hours with unserved power or load shedding also get
+    an entry in a sparse side table keyed on absolute hour: (unserved power, load shed). The
+    FAILURE and REDUCTION bits are set a whole stretch of hours at a time from the source status
+    arrays, and which sources failed or dropped is read back from those arrays only when
+    message() is asked for the text, e.g. by the hourly export.
+    """
+
+    def __init__(self):
+        self.codes = np.zeros(NUM_HOURS, dtype=np.int8)
+        self.details = {}
+
+    def record(self, i, unserved_power_req, load_shed):
+
+        code = 0
+        if unserved_power_req > 0:
+            code |= UNSERVED
+        if load_shed > 0:
+            code |= LOAD_SHED
+
+        self.codes[i] = code
+        if code:
+            self.details[i] = (unserved_power_req, load_shed)
+        else:
+            self.details.pop(i, None)
+
+    def record_source_events(self, start, stop, src_list):
+        # FAILURE / REDUCTION bits of the absolute hours start .. stop - 1, from the source statuses
+        if not src_list or stop <= start:
+            return
+        status = np.array([src.ops_data.status[start:stop] for src in src_list])
+        codes = self.codes[start:stop]
+        codes[(status == -1).any(axis=0)] |= FAILURE
+        codes[(status == 0.5).any(axis=0)] |= REDUCTION
+
+    def event_hours(self, code=None):
+        # Absolute hours that had any event, or any of the events in code.
+        return np.flatnonzero(self.codes if code is None else self.codes & code)
+
+    def message(self, i, src_list):
+
+        code = self.codes[i]
+        if not code:
+            return "Normal Operation"
+
+        unserved_power_req, load_shed = self.details.get(i, (0, 0))
+        if unserved_power_req > 0:
+            return f"Total power requirements could not be satisfied. Shortfall = {round(unserved_power_req,3)} MW"
+
+        log_parts = []
+        if code & FAILURE:
+            log_parts.append("Failures in sources " + ", ".join(
+                source_label(src) for src in src_list if src.ops_data.status[i] == -1))
+        if code & REDUCTION:
+            log_parts.append("sudden reductions in sources " + ", ".join(
+                source_label(src) for src in src_list if src.ops_data.status[i] == 0.5))
+        if load_shed > 0:
+            log_parts.append(f"{load_shed} MW load was shed")
+        return "; ".join(log_parts)
@@ -0,0 +1,409 @@
+import numpy as np
+from collections.abc import Mapping, MutableMapping
+from time_axis import NUM_YEARS, DAYS_IN_MONTH, HOURS_PER_DAY, NUM_DAYS, NUM_HOURS, day_index, month_days, year_slice
+
+HOUR_FIELDS = ('capacity', 'power_output', 'energy_output', 'reserve', 'status', 'mandatory_reserve')
+RESULT_FIELDS = ('power_req', 'unserved_power_req', 'sudden_power_drop', 'unserved_power_drop', 'load_shed')
+# Year and month level totals, filled in by the Source aggregation passes
+YEAR_TOTAL_FIELDS = ('year_failures', 'year_reductions', 'year_downtime', 'year_energy_output', 'year_cost_of_operation',
+                     'year_fuel_cost', 'year_fixed_opex', 'year_var_opex', 'year_depreciation', 'year_ppa_cost',
+                     'year_operation_hours', 'year_unit_cost')
+MONTH_TOTAL_FIELDS = ('month_failures', 'month_reductions', 'month_downtime', 'month_energy_output', 'month_operation_hours')
+DAY_FIELDS = ('avg_power_output', 'min_power_output', 'max_power_output', 'day_energy_output',
+              'failure_events', 'reduction_events', 'operation_hours', 'downtime')
+
+
+class OpsStore(dict):
+    """
+    Array backed operational data of a single source.
+
+    Every hourly field lives in one contiguous array indexed by absolute hour
+    (0 .. NUM_HOURS-1) and is reachable as an attribute, e.g. store.status[i].
+    The store itself still behaves like the old year -> months -> days -> hours
+    dictionary tree, so ops_data[y]['months'][m]['days'][d]['hours'][h]['status']
+    reads and writes the same arrays. Year and month level records are plain dicts,
+    day and hour records are light views created on access. Hour records go through
+    memoryviews of the arrays (hour_cells), so they read back plain Python floats
+    like the old dicts did instead of numpy scalars.
+    """
+
+    def __init__(self, start_year, end_year):
+        super().__init__()
+        self.capacity = np.zeros(NUM_HOURS)
+        self.power_output = np.zeros(NUM_HOURS)
+        self.energy_output = np.zeros(NUM_HOURS)
+        self.reserve = np.zeros(NUM_HOURS)
+        self.status = np.zeros(NUM_HOURS)
+        self.mandatory_reserve = np.zeros(NUM_HOURS)
+        self.hour_fields = {field: getattr(self, field) for field in HOUR_FIELDS}
+        self.hour_cells = {field: memoryview(values) for field, values in self.hour_fields.items()}
+        # the arrays allocated here, hour_fields may point elsewhere while bound (see bind)
+        self.own_fields = dict(self.hour_fields)
+        self.day_fields = {field: np.zeros(NUM_DAYS) for field in DAY_FIELDS}
+        # present[y - 1] is True when the source exists in year y.
+        self.present = np.zeros(NUM_YEARS, dtype=bool)
+
+        for year in range(1, NUM_YEARS + 1):
+            self[year] = {
+                'source_present': 0,
+                **dict.fromkeys(YEAR_TOTAL_FIELDS, 0),
+                'months': {
+                    month: {
+                        **dict.fromkeys(MONTH_TOTAL_FIELDS, 0),
+                        'days': DaysView(self, year, month)
+                    } for month in range(1, 13)
+                }
+            }
+        self.reset(start_year, end_year)
+
+    def reset(self, start_year=None, end_year=None):
+        """
+        Back to the state right after construction, reusing every buffer. With start_year and
+        end_year the store is set up for that operating period instead of the current one.
+        """
+        if start_year is not None:
+            self.present[:] = [start_year <= year <= end_year for year in range(1, NUM_YEARS + 1)]
+        for values in self.hour_fields.values():
+            values[:] = 0
+        for values in self.day_fields.values():
+            values[:] = 0
+        for year, year_data in self.items():
+            exists = self.present[year - 1]
+            if not exists:
+                self.status[year_slice(year)] = -3
+            year_data['source_present'] = 1 if exists else 0
+            year_data.update(dict.fromkeys(YEAR_TOTAL_FIELDS, 0))
+            for month_data in year_data['months'].values():
+                month_data.update(dict.fromkeys(MONTH_TOTAL_FIELDS, 0))
+
+    def snapshot(self):
+        # Copy of the arrays and year / month totals, to go back to this state later with restore
+        return {
+            'hours': {field: values.copy() for field, values in self.hour_fields.items()},
+            'days': {field: values.copy() for field, values in self.day_fields.items()},
+            'present': self.present.copy(),
+            'years': {year: {key: value for key, value in year_data.items() if key != 'months'}
+                      for year, year_data in self.items()},
+            'months': {(year, month): {key: value for key, value in month_data.items() if key != 'days'}
+                       for year, year_data in self.items() for month, month_data in year_data['months'].items()},
+        }
+
+    def restore(self, snapshot):
+        # Back to a state saved with snapshot, copied into the existing buffers
+        for field, values in snapshot['hours'].items():
+            self.hour_fields[field][:] = values
+        for field, values in snapshot['days'].items():
+            self.day_fields[field][:] = values
+        self.present[:] = snapshot['present']
+        for year, totals in snapshot['years'].items():
+            self[year].update(totals)
+        for (year, month), totals in snapshot['months'].items():
+            self[year]['months'][month].update(totals)
+
+    def hour(self, i):
+        # Direct route to the record of absolute hour i, skipping the intermediate month/day views.
+        return HourView(self.hour_cells, i)
+
+    def bind(self, field, values):
+        # Keep hourly field in values (NUM_HOURS long) from now on, e.g. a row of a FleetStore
+        setattr(self, field, values)
+        self.hour_fields[field] = values
+        self.hour_cells[field] = memoryview(values)
+
+    def unbind(self):
+        # Back to the store's own arrays, which do not see what was written while bound
+        for field, values in self.own_fields.items():
+            self.bind(field, values)
+
+
+class ResultsStore(dict):
+    """
+    Array backed hourly results of a Scenario, one array per field indexed by absolute hour,
+    e.g. results.load_shed[i]. Like OpsStore it still reads as the old year -> month -> day -> hour
+    tree, results[y][m][d][h]['power_req'], with the hour records as views on the arrays.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.hour_fields = {field: np.zeros(NUM_HOURS) for field in RESULT_FIELDS}
+        self.hour_cells = {field: memoryview(values) for field, values in self.hour_fields.items()}
+        for field, values in self.hour_fields.items():
+            setattr(self, field, values)
+
+        for year in range(1, NUM_YEARS + 1):
+            self[year] = {
+                month: {
+                    day: HoursView(self, day_index(year, month, day) * HOURS_PER_DAY) for day in month_days(month)
+                } for month in range(1, 13)
+            }
+
+    def hour(self, i):
+        # Results of absolute hour i, as OpsStore.hour
+        return HourView(self.hour_cells, i)
+
+
+class FleetStore:
+    """
+    The hourly arrays of several OpsStores stacked into one (len(HOUR_FIELDS), count, NUM_HOURS)
+    block, so fleet.status[:, i] holds the status of every unit in hour i. The stores' values are
+    copied in and each store is rebound to its rows, per unit reads and writes still work and go
+    to the same memory. block is reused when given (see StatePool.acquire_block), release() hands
+    the stores back their own arrays once the block is no longer used.
+
+    runs(i) reads hour i of all members as FleetRun records, one per run of neighbouring members
+    that are in the same state in hour i and the hour before. The dispatch updates a run once for
+    all its members, splitting it where members have to be treated differently, and flush() writes
+    the hour back.
+    """
+
+    def __init__(self, stores, block=None):
+        self.stores = stores
+        self.count = len(stores)
+        self.block = np.empty((len(HOUR_FIELDS), self.count, NUM_HOURS)) if block is None else block
+        for stacked, field in zip(self.block, HOUR_FIELDS):
+            setattr(self, field, stacked)
+            for store, row in zip(stores, stacked):
+                row[:] = store.hour_fields[field]
+                store.bind(field, row)
+        self.hour = None
+        self.run_list = []
+
+    def runs(self, i):
+        # FleetRuns of hour i, read from the block on first use in the hour and kept until flush()
+        if self.hour != i:
+            self.hour = i
+            prev = i - 1 if i > 0 else i
+            self.run_list = []
+            run = None
+            # per member [previous hour values, hour i values], in one read of the block
+            for n, values in enumerate(self.block[:, :, prev:i + 1].transpose(1, 2, 0).tolist()):
+                if run is not None and values == run_values:
+                    run.stop = n + 1
+                    continue
+                run_values = values
+                # the first hour of the run is its own previous hour
+                run = FleetRun(self, n, n + 1, values[-1], None if i == 0 else values[0], values[-1])
+                self.run_list.append(run)
+        return self.run_list
+
+    def split(self, run, k):
+        # Leave the first k members in run, the others go to a new run right after it, which is returned
+        rest = FleetRun(self, run.start + k, run.stop, run.values(), run.prev_values, run.loaded)
+        run.stop = run.start + k
+        n = next(n for n, other in enumerate(self.run_list) if other is run)
+        self.run_list.insert(n + 1, rest)
+        return rest
+
+    def flush(self):
+        # Write the runs of the current hour back to the block, unless they are as read
+        if self.hour is None:
+            return
+        runs = [(list(run.values()), run) for run in self.run_list]
+        if any(values != run.loaded for values, run in runs):
+            members = []
+            for values, run in runs:
+                members += [values] * run.count
+            self.block[:, :, self.hour] = np.array(members).T
+        self.hour = None
+        self.run_list = []
+
+    def release(self):
+        # Stores back on their own arrays, the block can be reused afterwards
+        for store in self.stores:
+            store.unbind()
+        self.hour = None
+        self.run_list = []
+
+
+class FleetRun(dict):
+    """
+    Hour record of fleet members start .. stop - 1, which are in the same state. Used like an
+    OpsStore.hour record, every read and write stands for all count members. previous() is the
+    record of the hour before, read only.
+    """
+
+    __slots__ = ('store', 'start', 'stop', 'prev_values', 'loaded')
+
+    def __init__(self, store, start, stop, values, prev_values, loaded):
+        super().__init__(zip(HOUR_FIELDS, values))
+        self.store = store
+        self.start = start
+        self.stop = stop
+        # None in the first hour of the run, which is its own previous hour
+        self.prev_values = prev_values
+        # the members' values as read from the block, to skip writing back unchanged hours
+        self.loaded = loaded
+
+    @property
+    def count(self):
+        return self.stop - self.start
+
+    def previous(self):
+        return self if self.prev_values is None else dict(zip(HOUR_FIELDS, self.prev_values))
+
+    def split(self, k):
+        return self.store.split(self, k)
+
+
+class StatePool:
+    """
+    Free lists of OpsStore and ResultsStore buffers for reuse across evaluations in one process.
+
+    acquire_ops / acquire_results hand out a released store reset in place, or a new one when
+    none is free. acquire_block does the same for the stacked arrays of a FleetStore, keyed on
+    the number of members. release_scenario gives back the stores of a finished Scenario, its
+    sources and its fleets, which must not be used afterwards. At most max_size buffers of each
+    kind are kept.
+    """
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.free_ops = []
+        self.free_results = []
+        self.free_blocks = {}
+        self.allocated = 0
+        self.reused = 0
+
+    def acquire_ops(self, start_year, end_year):
+        if self.free_ops:
+            store = self.free_ops.pop()
+            store.reset(start_year, end_year)
+            self.reused += 1
+            return store
+        self.allocated += 1
+        return OpsStore(start_year, end_year)
+
+    def acquire_results(self):
+        # Scenario.start_simulation clears the result arrays before every run
+        if self.free_results:
+            self.reused += 1
+            return self.free_results.pop()
+        self.allocated += 1
+        return ResultsStore()
+
+    def acquire_block(self, count):
+        # Uninitialised (len(HOUR_FIELDS), count, NUM_HOURS) array, FleetStore fills it
+        free = self.free_blocks.get(count)
+        if free:
+            self.reused += 1
+            return free.pop()
+        self.allocated += 1
+        return np.empty((len(HOUR_FIELDS), count, NUM_HOURS))
+
+    def release_scenario(self, scenario):
+        # fleets first, so the stores going back to the pool no longer point into the blocks
+        for fleet in scenario.plan.fleets:
+            fleet.store.release()
+            free = self.free_blocks.setdefault(fleet.count, [])
+            if len(free) < self.max_size:
+                free.append(fleet.store.block)
+        for src in scenario.src_list:
+            if isinstance(src.ops_data, OpsStore) and len(self.free_ops) < self.max_size:
+                self.free_ops.append(src.ops_data)
+            src.ops_data = {}
+        if scenario.hourly_results is not None and len(self.free_results) < self.max_size:
+            self.free_results.append(scenario.hourly_results)
+        scenario.hourly_results = None
+
+    def stats(self):
+        return {'allocated': self.allocated, 'reused': self.reused, 'free_ops': len(self.free_ops),
+                'free_results': len(self.free_results),
+                'free_blocks': sum(len(free) for free in self.free_blocks.values())}
+
+
+class DaysView(Mapping):
+
+    __slots__ = ('_store', '_first_day', '_num_days')
+
+    def __init__(self, store, year, month):
+        self._store = store
+        self._first_day = day_index(year, month, 1)
+        self._num_days = DAYS_IN_MONTH[month - 1]
+
+    def __getitem__(self, day):
+        if not 1 <= day <= self._num_days:
+            raise KeyError(day)
+        return DayView(self._store, self._first_day + day - 1)
+
+    def __iter__(self):
+        return iter(range(1, self._num_days + 1))
+
+    def __len__(self):
+        return self._num_days
+
+
+class DayView(MutableMapping):
+
+    __slots__ = ('_store', '_day')
+
+    def __init__(self, store, day):
+        self._store = store
+        self._day = day
+
+    def __getitem__(self, key):
+        if key == 'hours':
+            return HoursView(self._store, self._day * HOURS_PER_DAY)
+        return self._store.day_fields[key][self._day]
+
+    def __setitem__(self, key, value):
+        self._store.day_fields[key][self._day] = value
+
+    def __delitem__(self, key):
+        raise TypeError('Day records have a fixed set of fields')
+
+    def __iter__(self):
+        return iter(DAY_FIELDS + ('hours',))
+
+    def __len__(self):
+        return len(DAY_FIELDS) + 1
+
+
+class HoursView(Mapping):
+
+    __slots__ = ('_store', '_first_hour')
+
+    def __init__(self, store, first_hour):
+        self._store = store
+        self._first_hour = first_hour
+
+    def __getitem__(self, hour):
+        if not 0 <= hour < HOURS_PER_DAY:
+            raise KeyError(hour)
+        return HourView(self._store.hour_cells, self._first_hour + hour)
+
+    def __iter__(self):
+        return iter(range(HOURS_PER_DAY))
+
+    def __len__(self):
+        return HOURS_PER_DAY
+
+
+class HourView(MutableMapping):
+
+    __slots__ = ('_fields', '_i')
+
+    # a single unit, as opposed to a FleetRun
+    count = 1
+
+    def __init__(self, fields, i):
+        self._fields = fields
+        self._i = i
+
+    def __getitem__(self, key):
+        return self._fields[key][self._i]
+
+    def __setitem__(self, key, value):
+        self._fields[key][self._i] = value
+
+    def __delitem__(self, key):
+        raise TypeError('Hour records have a fixed set of fields')
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def previous(self):
+        # Record of the hour before, the first hour of the run is its own previous hour
+        return HourView(self._fields, self._i - 1 if self._i > 0 else self._i)
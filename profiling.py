@@ -0,0 +1,71 @@
+import cProfile
+import io
+import json
+import pstats
+import time
+
+
+class SimulationStats:
+    """
+    Opt-in timing of a Scenario run, see Scenario(profile=...).
+
+    phases maps a phase name to [cumulative wall seconds, calls]. Phases are timed around whole
+    method calls, so a phase that calls another (e.g. handle_sudden_power_drop and
+    distribute_deficit_among_sources) includes its time. hours counts the simulated hours and
+    simulate_seconds the time spent in Scenario.simulate_year. When profile_year is set that
+    year is also run under cProfile and the top functions by cumulative time are kept in
+    cprofile.
+    """
+
+    def __init__(self, profile_year=None, cprofile_lines=40):
+        self.phases = {}
+        self.hours = 0
+        self.profile_year = profile_year
+        self.cprofile_lines = cprofile_lines
+        self.cprofile = None
+
+    def timed(self, name, func):
+        # func wrapped so every call adds to phase name
+        record = self.phases.setdefault(name, [0.0, 0])
+
+        def timed_call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record[0] += time.perf_counter() - start
+                record[1] += 1
+
+        return timed_call
+
+    def profile_call(self, func, *args, **kwargs):
+        # Run func under cProfile and keep the report
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(self.cprofile_lines)
+            self.cprofile = report.getvalue()
+
+    @property
+    def simulate_seconds(self):
+        return self.phases.get('simulate_year', [0.0, 0])[0]
+
+    def to_dict(self):
+        simulate_seconds = self.simulate_seconds
+        return {
+            'hours': self.hours,
+            'simulate_seconds': simulate_seconds,
+            'hours_per_second': self.hours / simulate_seconds if simulate_seconds > 0 else 0,
+            'phases': {
+                name: {'seconds': seconds, 'calls': calls, 'seconds_per_call': seconds / calls if calls else 0}
+                for name, (seconds, calls) in sorted(self.phases.items(), key=lambda item: -item[1][0])
+            },
+            'profile_year': self.profile_year,
+            'cprofile': self.cprofile,
+        }
+
+    def write_json(self, filepath):
+        with open(filepath, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
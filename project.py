@@ -1,6 +1,47 @@
+import numpy as np
 import pandas as pd
 import os
 
+# Parsed Excel inputs are cached next to the workbooks they come from.
+SITE_LOAD_CACHE_FILE = '.site_load_cache.npz'
+PROFILE_CACHE_FILE = '.profile_cache.npz'
+
+
+def file_signature(file_paths):
+    # A cache entry is valid only while every source file keeps its path, size and modification time.
+    signature = []
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        signature.append(f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}")
+    return np.array(signature)
+
+
+def load_cache(cache_path, file_paths):
+    # Returns the cached arrays, or None if there is no cache or it no longer matches the inputs.
+    if not os.path.exists(cache_path):
+        return None
+    signature = file_signature(file_paths)
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            if not np.array_equal(cache['signature'], signature):
+                return None
+            return {key: cache[key] for key in cache.files}
+    except Exception as e:
+        print(f"Ignoring unreadable cache {cache_path}: {e}")
+        return None
+
+
+def save_cache(cache_path, file_paths, **arrays):
+    # Written to a temporary file first so parallel runs never see a half written cache.
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as cache_file:
+            np.savez_compressed(cache_file, signature=file_signature(file_paths), **arrays)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"Could not write cache {cache_path}: {e}")
+
+
 class Project:
 
     load_profile = {}  
@@ -9,12 +50,23 @@ class Project:
     load_projection = {}
     load_data = {}
     inflation_rate = 0 
+    # Flat 8760 hour copy of solar_profile, built on first use by solar_profile_array.
+    solar_profile_hourly = None
 
     #TO DO add try catch here.
     @classmethod
-    def read_load_projection(cls, folder_path):
+    def read_load_projection(cls, folder_path, use_cache=True):
         input_file_path = os.path.join(folder_path, 'input_data.xlsx')
+        cache_path = os.path.join(folder_path, SITE_LOAD_CACHE_FILE)
         try:
+            cache = load_cache(cache_path, [input_file_path]) if use_cache else None
+            if cache is not None:
+                cls.site_data.update(zip(cache['site_keys'].tolist(), cache['site_values'].tolist()))
+                for index, (critical_load, total_load) in enumerate(cache['load_projection'].tolist()):
+                    cls.load_projection[index + 1] = {'critical_load': critical_load, 'total_load': total_load}
+                print("Successfully read input_data from cache and updated dictionaries.")
+                return
+
             # Read 'site_load' worksheet for site_data
             site_load_df = pd.read_excel(input_file_path, sheet_name='site_load',header=2,nrows=3)
             print(site_load_df.columns)
@@ -33,6 +85,12 @@ class Project:
                     'total_load': row['total_load']
                     }
 
+            if use_cache:
+                save_cache(cache_path, [input_file_path],
+                           site_keys=np.array(site_load_df['site_details_attribute'].tolist(), dtype=str),
+                           site_values=site_load_df['value'].to_numpy(dtype=float),
+                           load_projection=load_projection_df[['critical_load', 'total_load']].to_numpy(dtype=float))
+
             print("Successfully read input_data and updated dictionaries.")
 
         except FileNotFoundError:
@@ -43,7 +101,26 @@ class Project:
             raise
     
     @classmethod
-    def read_load_solar_data_from_folder(cls, folder_path):
+    def read_load_solar_data_from_folder(cls, folder_path, use_cache=True):
+
+        cls.solar_profile_hourly = None
+        file_paths = [os.path.join(folder_path, f'load_{month:02d}.xlsx') for month in range(1, 13)]
+        cache_path = os.path.join(folder_path, PROFILE_CACHE_FILE)
+
+        if use_cache:
+            try:
+                cache = load_cache(cache_path, file_paths)
+            except FileNotFoundError as e:
+                print(f"File not found: {e.filename}")
+                raise
+            if cache is not None:
+                cls.load_profile.clear()
+                cls.solar_profile.clear()
+                for month, day, load, solar in zip(cache['months'].tolist(), cache['days'].tolist(), cache['load'], cache['solar']):
+                    cls.load_profile.setdefault(month, {})[day] = load.tolist()
+                    cls.solar_profile.setdefault(month, {})[day] = solar.tolist()
+                print(f"Successfully read load and solar profiles from cache. Days found: {len(cache['days'])}")
+                return
 
         for month in range(1, 13):
             file_name = f'load_{month:02d}.xlsx'
@@ -85,6 +162,31 @@ class Project:
                 print(f"Error processing file {file_name}: {e}")
                 raise
 
+        if use_cache:
+            months = [month for month in sorted(cls.load_profile) for day in sorted(cls.load_profile[month])]
+            days = [day for month in sorted(cls.load_profile) for day in sorted(cls.load_profile[month])]
+            save_cache(cache_path, file_paths,
+                       months=np.array(months), days=np.array(days),
+                       load=np.array([cls.load_profile[m][d] for m, d in zip(months, days)], dtype=float),
+                       solar=np.array([cls.solar_profile[m][d] for m, d in zip(months, days)], dtype=float))
+
+    @staticmethod
+    def profile_to_array(profile):
+        # Flatten a {month: {day: [24 values]}} profile into one array in calendar order.
+        return np.array([value for month in sorted(profile) for day in sorted(profile[month])
+                         for value in profile[month][day]], dtype=float)
+
+    @classmethod
+    def daily_profiles(cls):
+        # Load and solar profiles as (days, 24) arrays, one row per day of the year in calendar order.
+        return cls.profile_to_array(cls.load_profile).reshape(-1, 24), cls.solar_profile_array().reshape(-1, 24)
+
+    @classmethod
+    def solar_profile_array(cls):
+        if cls.solar_profile_hourly is None:
+            cls.solar_profile_hourly = cls.profile_to_array(cls.solar_profile)
+        return cls.solar_profile_hourly
+
     #TO DO add try catch here.
     @classmethod
     def create_load_data(cls):
@@ -0,0 +1,143 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import fmean, stdev
+from evaluation import build_sources, load_prereq_data
+from scenario import Scenario
+
+
+def replication_seed(seed, replication, unit):
+    # Independent failure stream per replication and unit, None draws fresh entropy every time.
+    return None if seed is None else [seed, replication, unit]
+
+
+def t_quantile(confidence, df):
+    """
+    Two sided Student-t critical value, |T| <= t with probability confidence for df degrees of
+    freedom. Bisection on the closed form of P(|T| <= t) for whole df (Abramowitz & Stegun
+    26.7.3, 26.7.4), the standard library has no t distribution.
+    """
+    def two_sided(t):
+        theta = math.atan(t / math.sqrt(df))
+        cos2 = math.cos(theta) ** 2
+        if df % 2:
+            term, series = math.cos(theta), 0.0
+            for k in range(1, (df - 1) // 2 + 1):
+                series += term
+                term *= cos2 * 2 * k / (2 * k + 1)
+            return 2 / math.pi * (theta + math.sin(theta) * series)
+        term, series = 1.0, 0.0
+        for k in range(1, df // 2 + 1):
+            series += term
+            term *= cos2 * (2 * k - 1) / (2 * k)
+        return math.sin(theta) * series
+
+    low, high = 0.0, 1.0
+    while two_sided(high) < confidence:
+        low, high = high, 2 * high
+    for _ in range(100):
+        middle = (low + high) / 2
+        if two_sided(middle) < confidence:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+def run_replications(individual, scenario_params, replications, seed=None):
+    """
+    Simulate one configuration once per replication number and return one scenario_kpis dict
+    per replication. Sources, load data and the dispatch plan are set up once; between
+    replications only the failure and sudden drop realisations of the sources are redrawn,
+    the capacity and BESS reserve columns are copied back from the configured sources.
+    """
+    src_list = build_sources(individual, keep_configured=True)
+    # Scenario sorts src_list by priority in place, reseed in build order so unit numbers stay stable
+    units = list(src_list)
+    sc = Scenario(selected_sources=src_list, **{'kpi_only': True, **scenario_params})
+
+    kpi_samples = []
+    for replication in replications:
+        for unit, src in enumerate(units):
+            src.reseed(replication_seed(seed, replication, unit))
+        sc.simulate()
+        kpi_samples.append(dict(sc.scenario_kpis))
+    return kpi_samples
+
+
+def summarise_replications(kpi_samples, confidence=0.95):
+    """
+    Mean, standard deviation and confidence interval of every KPI over the replications.
+    The interval is mean +/- t * std / sqrt(n) with the Student-t quantile for n - 1 degrees of
+    freedom, so it also holds for the few replications usual here. A single replication gives
+    a zero width interval.
+    """
+    n = len(kpi_samples)
+    t = t_quantile(confidence, n - 1) if n > 1 else 0.0
+    summary = {}
+    for kpi in kpi_samples[0]:
+        values = [float(kpis[kpi]) for kpis in kpi_samples]
+        mean = fmean(values)
+        std = stdev(values) if n > 1 else 0.0
+        half_width = t * std / math.sqrt(n)
+        summary[kpi] = {
+            'mean': mean,
+            'std': std,
+            'ci_low': mean - half_width,
+            'ci_high': mean + half_width,
+        }
+    summary['Replications'] = n
+    return summary
+
+
+class ReplicationEngine:
+    """
+    Monte Carlo estimate of the KPIs of a configuration over many failure realisations.
+
+    run() spreads the replications over a process pool whose workers load the Project and
+    SourceManager data once at start up, each worker sets the configuration up once and then
+    only reseeds it. workers <= 1 runs everything in this process. With a seed the result
+    does not depend on the number of workers. Use as a context manager, or call close(), to
+    shut the pool down.
+    """
+
+    def __init__(self, scenario_params, data_folder='data', workers=None, seed=None):
+        self.scenario_params = scenario_params
+        self.data_folder = data_folder
+        self.workers = os.cpu_count() if workers is None else workers
+        self.seed = seed
+        self.executor = None
+
+        if self.workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=load_prereq_data, initargs=(data_folder,))
+        else:
+            load_prereq_data(data_folder)
+
+    def sample(self, individual, replications=30):
+        # scenario_kpis of every replication, in replication order
+
+        if self.executor is None:
+            return run_replications(individual, self.scenario_params, range(replications), self.seed)
+
+        # One contiguous block of replication numbers per worker
+        n_chunks = min(self.workers, replications)
+        chunks = [range(replications * k // n_chunks, replications * (k + 1) // n_chunks) for k in range(n_chunks)]
+        kpi_samples = []
+        for chunk_samples in self.executor.map(run_replications, [individual] * n_chunks,
+                                               [self.scenario_params] * n_chunks, chunks, [self.seed] * n_chunks):
+            kpi_samples.extend(chunk_samples)
+        return kpi_samples
+
+    def run(self, individual, replications=30, confidence=0.95):
+        return summarise_replications(self.sample(individual, replications), confidence)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
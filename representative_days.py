@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+from project import Project
+from time_axis import NUM_YEARS, DAYS_PER_YEAR, HOURS_PER_DAY, HOURS_PER_YEAR
+
+# Status codes drawn or set up by Source.configure, which the dispatch never overwrites:
+# failure, downtime, not present and sudden solar drop
+SEEDED_STATUS = (-1, -2, -3, 0.5)
+
+
+class RepresentativeDays:
+    """
+    A handful of actual days of the year that stand in for all of them in screening runs.
+
+    days are the chosen days of the year (0 based, calendar order), weights the number of days
+    of the year each one stands for and labels maps every day of the year to the position of its
+    representative in days. metrics describes how well the reduction fits the profiles, see
+    select_representative_days. Pass it to Scenario(representative_days=...) to simulate only
+    these days of every year, seeded_status_mismatches checks such a run against the full one.
+    """
+
+    def __init__(self, days, weights, labels, metrics):
+        self.days = days
+        self.weights = weights
+        self.labels = labels
+        self.metrics = metrics
+        # weight of every day of the year, 0 for days that are not simulated
+        self.day_weights = np.zeros(DAYS_PER_YEAR, dtype=int)
+        self.day_weights[days] = weights
+        self.hour_weights = np.repeat(self.day_weights, HOURS_PER_DAY)
+        # same for every day of the run
+        self.run_day_weights = np.tile(self.day_weights, NUM_YEARS)
+
+    def hour_ranges(self, y):
+        # (first hour, end hour) of every stretch of consecutive representative days in year y, absolute hours
+        first_hour = (y - 1) * HOURS_PER_YEAR
+        ranges = []
+        for day in self.days:
+            start = first_hour + day * HOURS_PER_DAY
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], start + HOURS_PER_DAY)
+            else:
+                ranges.append((start, start + HOURS_PER_DAY))
+        return ranges
+
+
+def day_features(load, solar):
+    # Each series scaled by its own peak so load and solar shape count equally in the clustering
+    return np.hstack((load / load.max(), solar / solar.max() if solar.max() > 0 else solar))
+
+
+def kmeans(features, k, rng, max_iter=100):
+    # k-means++ seeding followed by Lloyd iterations, returns (labels, centroids, inertia)
+    centroids = [features[rng.integers(len(features))]]
+    for _ in range(1, k):
+        distance = ((features[:, None, :] - np.array(centroids)[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+        if distance.sum() == 0:
+            # fewer distinct days than clusters
+            break
+        centroids.append(features[rng.choice(len(features), p=distance / distance.sum())])
+    centroids = np.array(centroids)
+    k = len(centroids)
+
+    labels = None
+    for _ in range(max_iter):
+        distance = ((features[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        new_labels = distance.argmin(axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = features[labels == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+    inertia = float(((features - centroids[labels]) ** 2).sum())
+    return labels, centroids, inertia
+
+
+def silhouette(features, labels):
+    # Mean silhouette coefficient of the days, 0 when there is a single cluster
+    if len(np.unique(labels)) < 2:
+        return 0.0
+    distance = np.sqrt(((features[:, None, :] - features[None, :, :]) ** 2).sum(axis=2))
+    scores = np.zeros(len(features))
+    for n, label in enumerate(labels):
+        same = labels == label
+        if same.sum() == 1:
+            continue
+        a = distance[n, same].sum() / (same.sum() - 1)
+        b = min(distance[n, labels == other].mean() for other in np.unique(labels) if other != label)
+        scores[n] = (b - a) / max(a, b)
+    return float(scores.mean())
+
+
+def select_representative_days(k, seed=0, n_init=5):
+    """
+    Cluster the (load, solar) profile pairs of the days of the year into k groups and take the
+    day closest to each group centre as its representative, weighted by the group size.
+    Project profiles must be loaded. The fit is reported in metrics:
+    inertia and silhouette of the clustering, RMSE (MW) between every day's load / solar
+    profile and its representative, weighted energy error (%) of the year's load and solar,
+    and the error (%) of the peak load.
+    """
+    load, solar = Project.daily_profiles()
+    features = day_features(load, solar)
+    k = min(k, len(features))
+    rng = np.random.default_rng(seed)
+
+    # best of n_init clusterings
+    labels, centroids, inertia = min((kmeans(features, k, rng) for _ in range(n_init)), key=lambda fit: fit[2])
+
+    # representative of each non empty cluster: the member day nearest its centre
+    representative = {}
+    for c in range(len(centroids)):
+        members = np.flatnonzero(labels == c)
+        if len(members):
+            representative[c] = int(members[((features[members] - centroids[c]) ** 2).sum(axis=1).argmin()])
+    days = np.array(sorted(representative.values()))
+    position = {day: n for n, day in enumerate(days)}
+    day_labels = np.array([position[representative[c]] for c in labels])
+    weights = np.bincount(day_labels, minlength=len(days))
+
+    represented_load = load[days][day_labels]
+    represented_solar = solar[days][day_labels]
+    metrics = {
+        'k': len(days),
+        'inertia': inertia,
+        'silhouette': silhouette(features, labels),
+        'load_rmse': float(np.sqrt(((load - represented_load) ** 2).mean())),
+        'solar_rmse': float(np.sqrt(((solar - represented_solar) ** 2).mean())),
+        'load_energy_error_pct': float(100 * (represented_load.sum() / load.sum() - 1)),
+        'solar_energy_error_pct': float(100 * (represented_solar.sum() / solar.sum() - 1)) if solar.sum() > 0 else 0.0,
+        'peak_load_error_pct': float(100 * (load[days].max() / load.max() - 1)),
+    }
+    return RepresentativeDays(days, weights, day_labels, metrics)
+
+
+def seeded_status_mismatches(full_run, reduced_run):
+    """
+    Check of a reduced run (representative days or a subset of years) against the full run of the
+    same sources, built with the same seed: per source in src_list order, the number of hours where
+    the two status arrays disagree on a SEEDED_STATUS code. Skipped hours must keep their failures
+    and downtime too, so every count should be 0.
+    """
+    mismatches = []
+    for full_src, reduced_src in zip(full_run.src_list, reduced_run.src_list):
+        full_status = full_src.ops_data.status
+        reduced_status = reduced_src.ops_data.status
+        seeded = np.isin(full_status, SEEDED_STATUS) | np.isin(reduced_status, SEEDED_STATUS)
+        mismatches.append(int((full_status[seeded] != reduced_status[seeded]).sum()))
+    return mismatches
+
+
+def representative_day_report(ks, seed=0):
+    # Fit metrics for each candidate number of representative days, one row per k
+    return pd.DataFrame([select_representative_days(k, seed).metrics for k in ks]).set_index('k')
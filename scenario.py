@@ -1,14 +1,28 @@
 import csv
 import datetime
+import os
 import openpyxl
 import pandas as pd
 import math
 import random
 from project import Project
-from itertools import groupby
+from time_axis import NUM_YEARS, HOURS_PER_DAY, HOURS_PER_YEAR, HOUR_YEAR, HOUR_MONTH, HOUR_DAY, HOUR_OF_DAY, \
+    hour_index, month_days, year_slice
+from dispatch_plan import DispatchPlan, Fleet, add_members, step_members
+from bulk_dispatch import BulkDispatch, bulk_dispatch_supported
+from event_log import EventLog
+from ops_store import ResultsStore
+from profiling import SimulationStats
+
+# Steps and passes timed when a Scenario is profiled
+PROFILED_PHASES = ('set_bess_parameters', 'calc_src_power_and_energy2', 'utilize_reserves', 'bess_non_em_contribution',
+                   'charge_bess', 'handle_sudden_power_drop', 'distribute_deficit_among_sources', 'resume_bess',
+                   'aggregate_data_for_reporting')
 
 class Scenario:
-    def __init__(self, name, client_name, selected_sources, spin_reserve_perc=20, bess_non_emergency_use = 2,bess_charge_hours=1,bess_priority_wise_use = True,charge_ratio_night = 30):
+    def __init__(self, name, client_name, selected_sources, spin_reserve_perc=20, bess_non_emergency_use = 2,bess_charge_hours=1,bess_priority_wise_use = True,charge_ratio_night = 30, bulk_dispatch = True, fleets = True, kpi_only = False,
+                 abort_critical_interruptions = None, abort_unserved_hours = None, representative_days = None,
+                 profile = False, profile_year = None, state_pool = None):
         self.name = name
         self.client_name = client_name
         self.scenario_kpis = {
@@ -24,27 +38,63 @@ class Scenario:
         self.bess_non_emergency_use = bess_non_emergency_use
         self.bess_priority_wise_use = bess_priority_wise_use
         self.charge_ratio_night = charge_ratio_night
+        #event free hours are dispatched a whole stretch at a time, False runs every hour through the hourly path
+        self.bulk_dispatch = bulk_dispatch
+        #runs of identical units are dispatched as fleets (DispatchPlan), False dispatches unit by unit
+        self.fleets = fleets
+        #kpi_only keeps just the yearly totals the KPIs need: no hourly results, event log,
+        #day/month source stats or per source breakdown in yearly_results. Meant for optimisation runs.
+        self.kpi_only = kpi_only
+        #optional reliability limits over the whole run. simulate stops as soon as one is exceeded,
+        #the partial result is flagged with 'Aborted' in scenario_kpis. None means no limit.
+        self.abort_critical_interruptions = abort_critical_interruptions
+        self.abort_unserved_hours = abort_unserved_hours
+        self.aborted_at_hour = None
+        #RepresentativeDays to simulate only a few weighted days of every year, for screening studies.
+        #Energy, costs and event counts of a simulated day are scaled by the number of days it stands for.
+        self.representative_days = representative_days
+        self.last_simulated_hour = None
+        #opt-in timing of every run into self.stats (a SimulationStats, None when off). profile may also be
+        #a SimulationStats that already holds other timings, e.g. Source.configure from build_sources.
+        #profile_year additionally runs that year under cProfile.
+        if isinstance(profile, SimulationStats):
+            self.stats = profile
+        elif profile or profile_year is not None:
+            self.stats = SimulationStats()
+        else:
+            self.stats = None
+        if profile_year is not None:
+            self.stats.profile_year = profile_year
+        self.instrumented = False
         self.src_list = selected_sources
         self.src_list.sort(key=lambda src: src.config['priority'])
-        self.hourly_results = {
-            y: {
-                m: {
-                    d: {
-                        h: {
-                            'power_req' : 0,
-                            'unserved_power_req': 0,
-                            'sudden_power_drop' : 0,
-                            'unserved_power_drop' : 0,
-                            'load_shed' : 0,
-                            'log' : 0
-                            } for h in range(24)
-                        } for d in range(1, 32)
-                    } for m in range(1, 13)
-                } for y in range(1, 13)}
+        #groupings used by the hourly dispatch, src_list keeps its priority order from here on
+        self.plan = DispatchPlan(self.src_list, state_pool, fleets)
+        self.bess_sources = tuple(self.src_list[i] for i in self.plan.bess)
+        #hourly power requirement and outcome, arrays indexed by absolute hour. Taken from state_pool
+        #(a StatePool) when given, hand it back with state_pool.release_scenario once done.
+        if kpi_only:
+            self.hourly_results = None
+        else:
+            self.hourly_results = ResultsStore() if state_pool is None else state_pool.acquire_results()
+        #per hour event codes, the text log is only rendered on request through hourly_log
+        self.event_log = None if kpi_only else EventLog()
+        #year -> [energy requirement, unserved hours, critical load interruptions, load shedding events]
+        self.year_totals = {}
         self.yearly_results = []
         
 
-    def calc_src_power_and_energy2(self, y, m, d, h, power_req):
+    def unit_records(self, units, i):
+        # (source, hour i record) of every unit, a fleet as its unit with a record per run of members
+        # in the same state (FleetStore.runs). Runs split during the loop come up right after.
+        for src in units:
+            if isinstance(src, Fleet):
+                for run in src.store.runs(i):
+                    yield src.unit, run
+            else:
+                yield src, src.ops_data.hour(i)
+
+    def calc_src_power_and_energy2(self, i, power_req):
 
         rem_power_req = power_req
         #rem_spin_reserve_req = power_req * self.spinning_reserve_perc/100
@@ -55,49 +105,52 @@ class Scenario:
         This iteration over groups is to make sure that source groups that need to deliver
         spinning reserve provide it by running at their minimum loading
         """
-        for priority, group in groupby(self.src_list, key=lambda x: x.config['priority']):
+        for group in self.plan.spin_reserve_groups:
 
-            sources = list(group)
-            if not sources or sources[0].metadata['type']['value'] == 'BESS' or sources[0].config['spinning_reserve'] == 0:
-                continue
-            
-            grp_reserve_req_contrib = power_req * self.spinning_reserve_perc * sources[0].config['spinning_reserve']/(100*100)
+            grp_reserve_req_contrib = power_req * self.spinning_reserve_perc * group.spinning_reserve/(100*100)
             if grp_reserve_req_contrib == 0:
                 continue
             min_load_src_count = 0
             grp_output = 0
             grp_reserve = 0
         
-            for src in sources:
-                src_hourly_ops_data = src.ops_data[y]['months'][m]['days'][d]['hours'][h]
-                
+            for src, src_hourly_ops_data in self.unit_records(group.units, i):
+
                 if src_hourly_ops_data['status'] in [-2, -3] or src_hourly_ops_data['capacity'] ==0:  # Source is not available
                     continue
                 #run src at min load and save status. check if req contrib from group to SR is met. If yes, get next group
                 min_src_output = src_hourly_ops_data['capacity'] * src.config['min_loading']/100
+                #of a fleet run, only the members needed to meet it
+                src_reserve = src_hourly_ops_data['capacity'] - min_src_output
+                n, _, grp_reserve = step_members(src_hourly_ops_data.count, grp_reserve,
+                                                 lambda reserve: (src_reserve, reserve + src_reserve),
+                                                 lambda reserve: reserve >= grp_reserve_req_contrib)
+                if n < src_hourly_ops_data.count:
+                    src_hourly_ops_data.split(n)
                 src_hourly_ops_data['power_output'] = min_src_output
-                grp_reserve += src_hourly_ops_data['capacity'] - min_src_output
                 #0.1 status is to temporarily identify which sources were used to meet initial spin reserve.
                 src_hourly_ops_data['status'] = 0.1 if src_hourly_ops_data['status'] == 0 else src_hourly_ops_data['status']
-                min_load_src_count +=1
+                min_load_src_count += n
                 if grp_reserve >= grp_reserve_req_contrib:
                     break
-             
+
             if grp_reserve > 0:
                 min_reserve_on_each_src = grp_reserve_req_contrib / min_load_src_count
 
-                for src in sources:
-                    src_hourly_ops_data = src.ops_data[y]['months'][m]['days'][d]['hours'][h]
+                for src, src_hourly_ops_data in self.unit_records(group.units, i):
                     if src_hourly_ops_data['status'] in [0,-2,-3]:
                         continue
                     #if src_hourly_ops_data['status'] == 0.1:
                     #    src_hourly_ops_data['status'] = 1
 
-                    grp_output += src_hourly_ops_data['power_output']
+                    n = min(src_hourly_ops_data.count, min_load_src_count)
+                    if n < src_hourly_ops_data.count:
+                        src_hourly_ops_data.split(n)
+                    grp_output = add_members(grp_output, src_hourly_ops_data['power_output'], n)
                     src_hourly_ops_data['mandatory_reserve'] = min_reserve_on_each_src
                     src_hourly_ops_data['reserve'] = src_hourly_ops_data['capacity'] - src_hourly_ops_data['power_output']
                     src_hourly_ops_data['energy_output'] = src_hourly_ops_data['power_output']
-                    min_load_src_count -=1
+                    min_load_src_count -= n
                     if min_load_src_count == 0:
                         break
             #rem_power_req -= grp_output
@@ -107,13 +160,10 @@ class Scenario:
         The min power they deiver is netted off hourly power requirement.
         Now we iterate over source groups to meet remaining power requirement
         """
-        for priority, group in groupby(self.src_list, key=lambda x: x.config['priority']):
+        for group in self.plan.priority_groups:
             
-            sources = list(group)
-            if not sources:
-                continue
-            if sources[0].metadata['type']['value'] == 'BESS' and self.bess_priority_wise_use:
-                rem_power_req = self.bess_non_em_contribution(y,m,d,h,rem_power_req)
+            if group.is_bess and self.bess_priority_wise_use:
+                rem_power_req = self.bess_non_em_contribution(i,rem_power_req)
                 if rem_power_req == 0:
                     break
                 continue
@@ -121,17 +171,20 @@ class Scenario:
             grp_potential_output = 0
             grp_output = 0
 
-            for src in sources:
-                
-                src_hourly_ops_data = src.ops_data[y]['months'][m]['days'][d]['hours'][h]
+            for src, src_hourly_ops_data in self.unit_records(group.units, i):
+
                 if src_hourly_ops_data['status'] in [-2,-3] or src_hourly_ops_data['capacity'] == 0:
                     continue
                 src_can_provide = src_hourly_ops_data['capacity'] - src_hourly_ops_data['power_output'] - \
                     src_hourly_ops_data['mandatory_reserve']
                 if src_can_provide <= 0:
                     continue
-                #coming to this block means that source can contribute
-                grp_potential_output += src_can_provide
+                #coming to this block means that source can contribute, of a fleet run the members needed
+                n, _, grp_potential_output = step_members(src_hourly_ops_data.count, grp_potential_output,
+                                                          lambda potential: (src_can_provide, potential + src_can_provide),
+                                                          lambda potential: potential > rem_power_req)
+                if n < src_hourly_ops_data.count:
+                    src_hourly_ops_data.split(n)
                 
                 if src_hourly_ops_data['status'] != 0.1:
                     src_hourly_ops_data['power_output'] = -1
@@ -146,9 +199,8 @@ class Scenario:
                 loading_factor = rem_power_req / grp_potential_output
                 loading_factor = 1 if loading_factor > 1 else loading_factor
                 group_actual_output = 0
-                for src in sources:
-            
-                    src_hourly_ops_data = src.ops_data[y]['months'][m]['days'][d]['hours'][h]
+                for src, src_hourly_ops_data in self.unit_records(group.units, i):
+
                     if src_hourly_ops_data['status'] in [-2,-3] or src_hourly_ops_data['capacity'] == 0:
                         continue
                     
@@ -170,7 +222,8 @@ class Scenario:
                         src_hourly_ops_data['power_output'] = loading_factor * (src_hourly_ops_data['capacity'] - \
                                     src_hourly_ops_data['power_output'] - \
                                         src_hourly_ops_data['mandatory_reserve'])
-                        sudden_power_drop += src_hourly_ops_data['power_output']
+                        sudden_power_drop = add_members(sudden_power_drop, src_hourly_ops_data['power_output'],
+                                                        src_hourly_ops_data.count)
                         src_hourly_ops_data['energy_output'] = 0
                     
                     elif src_hourly_ops_data['status'] == 0.5 and src_hourly_ops_data['power_output'] == -1:
@@ -181,12 +234,14 @@ class Scenario:
                                         src_hourly_ops_data['mandatory_reserve'])
 
 
-                        year, month, day, hour = self.previous_hour(y,m,d,h)
-                        power_output_prev_hour = src.ops_data[year]['months'][month]['days'][day]['hours'][hour]['power_output']
-                        sudden_power_drop +=  power_output_prev_hour - src_hourly_ops_data['power_output']
+                        #sudden drops are never seeded at midnight, so there always is a previous hour
+                        power_output_prev_hour = src_hourly_ops_data.previous()['power_output']
+                        sudden_power_drop = add_members(sudden_power_drop, power_output_prev_hour - src_hourly_ops_data['power_output'],
+                                                        src_hourly_ops_data.count)
                         src_hourly_ops_data['energy_output'] = src_hourly_ops_data['power_output']
 
-                    group_actual_output += src_hourly_ops_data['power_output']
+                    group_actual_output = add_members(group_actual_output, src_hourly_ops_data['power_output'],
+                                                      src_hourly_ops_data.count)
                 rem_power_req = max(0, rem_power_req - group_actual_output)
                 if rem_power_req < 0.01:
                     rem_power_req = 0
@@ -196,26 +251,24 @@ class Scenario:
         
         return rem_power_req, sudden_power_drop
 
-    def bess_non_em_contribution(self,y,m,d,h,rem_power_req):
+    def bess_non_em_contribution(self, i,rem_power_req):
 
-        bess_sources = [src for src in self.src_list if src.metadata['type']['value']== 'BESS']
+        bess_sources = self.bess_sources
         if bess_sources:
             #find total capacity, get loading factor then load each source equally.
             total_bess_cap = 0
 
-            for src in bess_sources:
+            for src, src_hourly_data in self.unit_records(self.plan.bess_units, i):
 
-                src_hourly_data = src.ops_data[y]['months'][m]['days'][d]['hours'][h]
                 if src_hourly_data['status'] not in [-1, -2, -3]:
 
-                    total_bess_cap += src_hourly_data['reserve']
+                    total_bess_cap = add_members(total_bess_cap, src_hourly_data['reserve'], src_hourly_data.count)
             
             if self.bess_non_emergency_use == 1:
 
                 loading_factor = rem_power_req / total_bess_cap if total_bess_cap >= rem_power_req else 1
-                for src in bess_sources:
-                
-                    src_hourly_data = src.ops_data[y]['months'][m]['days'][d]['hours'][h]
+                for src, src_hourly_data in self.unit_records(self.plan.bess_units, i):
+
                     if src_hourly_data['status'] not in [-1, -2, -3]:
 
                         src_hourly_data['power_output'] = src_hourly_data['reserve'] * loading_factor
@@ -225,21 +278,26 @@ class Scenario:
 
             elif self.bess_non_emergency_use == 2:
 
-                for src in bess_sources:
-                
-                    src_hourly_data = src.ops_data[y]['months'][m]['days'][d]['hours'][h]
+                for src, src_hourly_data in self.unit_records(self.plan.bess_units, i):
+
                     if src_hourly_data['status'] not in [-1, -2, -3]:
                         
                         if src_hourly_data['reserve'] == 0:
                             src_hourly_data['status'] = 0
                             continue    
-                        else:
-                            src_hourly_data['status'] = 1
-                        src_hourly_data['power_output'] = min(rem_power_req, src_hourly_data['reserve'])
+                        #of a fleet run, the members drained completely go together
+                        reserve = src_hourly_data['reserve']
+                        n, power_output, rem_power_req = step_members(
+                            src_hourly_data.count, rem_power_req,
+                            lambda remaining: (min(remaining, reserve), max(0, remaining - min(remaining, reserve))),
+                            lambda remaining: remaining < 0.01)
+                        if n < src_hourly_data.count:
+                            src_hourly_data.split(n)
+                        src_hourly_data['status'] = 1
+                        src_hourly_data['power_output'] = power_output
                         src_hourly_data['energy_output'] = src_hourly_data['power_output']
                         src_hourly_data['reserve'] -= src_hourly_data['power_output']
 
-                        rem_power_req = max(0,rem_power_req - src_hourly_data['power_output'])
                         if rem_power_req < 0.01:
                             rem_power_req = 0
                             break
@@ -247,100 +305,233 @@ class Scenario:
                 rem_power_req = 0
         return rem_power_req
     
-    def simulate(self):
-
-        for y in range(1,13):
-
+    def simulate(self, years=None):
+        """
+        Run the hourly dispatch over the whole horizon, or only over the given years as a cheap
+        proxy of the full run. With a subset the yearly results and KPIs cover just those years.
+        """
+        self.start_simulation()
+        for y in range(1, NUM_YEARS + 1) if years is None else sorted(years):
             print(f'Simulating Year {y}')
-            for m in range (1,13):
-
-                if m == 2:  # February
-                    days = 28
-                elif m in [4, 6, 9, 11]:  # April, June, September, November
-                    days = 30
-                else:  # All other months
-                    days = 31
-
-                for d in range (1, days+1):
-
-                    for h in range (0,24):
-                        
-                        #if y == 1 and m == 1 and d== 19 and h == 8:
-                        #    print('we are bloody here')
-                        #if self.src_list[0].ops_data[1]['months'][1]['days'][19]['hours'][8]['capacity'] == 0:
-                        #    print('solar capacity has just become zero')
-
-                        hourly_results = self.hourly_results[y][m][d][h]
-                        #set the power requirement
-                        power_req = Project.load_data[y][m][d][h]
-                        hourly_results['power_req'] = power_req
-
-                        self.set_bess_parameters(y,m,d,h, starting = True)
-                        #power_req += charging_pwr_req
-                        #Consumption of sources, update key results in the scenario
-                        unserved_power_req, sudden_power_drop = self.calc_src_power_and_energy2(y,m,d,h,power_req)
-                        #Use bess only if needed
-                        if unserved_power_req > 0:
-
-                           unserved_power_req = self.utilize_reserves(y,m,d,h,unserved_power_req)
-
-                        if unserved_power_req > 0 and self.bess_non_emergency_use in [1,2] and not self.bess_priority_wise_use:
-                            unserved_power_req = self.bess_non_em_contribution(y,m,d,h,unserved_power_req)
-                        
-                        unserved_power_drop = 0
-                        load_shed = 0
-
-                        if unserved_power_req <=0:
-
-                            self.charge_bess(y,m,d,h)
-
-                            if sudden_power_drop > 0:
-
-                                unserved_power_drop,load_shed = self.handle_sudden_power_drop(y, m, d, h, sudden_power_drop)
-
-                        #_ = self.set_bess_parameters(y,m,d,h, starting = False)
+            if not self.simulate_year(y, Project.profile_to_array(Project.load_data[y])):
+                break
+        self.aggregate_data_for_reporting()
+
+    def start_simulation(self):
+
+        #a Scenario can be simulated again after its sources are reseeded, start from clean results
+        if self.hourly_results is not None:
+            for values in self.hourly_results.hour_fields.values():
+                values[:] = 0
+            self.event_log = EventLog()
+        if self.stats is not None:
+            self.instrument()
+        self.year_totals.clear()
+        self.aborted_at_hour = None
+        self.last_simulated_hour = None
+        self.critical_budget = math.inf if self.abort_critical_interruptions is None else self.abort_critical_interruptions
+        self.unserved_budget = math.inf if self.abort_unserved_hours is None else self.abort_unserved_hours
+
+    def simulate_year(self, y, year_power_req):
+        """
+        Dispatch every hour of year y against the hourly power requirement year_power_req.
+        Returns False if the run was aborted on the reliability limits, after which no further
+        years should be simulated.
+        """
+        use_bulk_dispatch = self.bulk_dispatch and bulk_dispatch_supported(self)
+        results = self.hourly_results
+        rep_days = self.representative_days
+        #set the power requirement for the whole year
+        if results is not None:
+            results.power_req[year_slice(y)] = year_power_req
+        if rep_days is None:
+            hour_weights = None
+            year_totals = self.year_totals[y] = [float(year_power_req.sum()), 0, 0, 0]
+            hour_ranges = [(year_slice(y).start, year_slice(y).stop)]
+            bulk = BulkDispatch(self, y, year_power_req) if use_bulk_dispatch else None
+        else:
+            hour_weights = rep_days.hour_weights.tolist()
+            year_totals = self.year_totals[y] = [float(year_power_req @ rep_days.hour_weights), 0, 0, 0]
+            hour_ranges = rep_days.hour_ranges(y)
+            bulk = BulkDispatch(self, y, year_power_req, rep_days.hour_weights > 0) if use_bulk_dispatch else None
+        year_power_req_array, year_power_req = year_power_req, year_power_req.tolist()
+        if self.stats is not None:
+            self.stats.hours += sum(range_end - range_start for range_start, range_end in hour_ranges)
+            if bulk is not None:
+                bulk.dispatch = self.stats.timed('bulk_dispatch', bulk.dispatch)
+
+        first_hour = year_slice(y).start
+        for range_start, range_end in hour_ranges:
+            #hours before this stretch were skipped (other years or days)
+            skipped_hour = None
+            if range_start > 0 and self.last_simulated_hour != range_start - 1:
+                skipped_hour = self.resume_bess(range_start)
+            i = range_start
+            while i < range_end:
+
+                if bulk is not None:
+                    bulk_end = bulk.dispatch(i)
+                    if bulk_end > i:
+                        #event free stretch, sources are dispatched and there is nothing to log
+                        i = bulk_end
+                        continue
 
-                        hourly_results['unserved_power_req'] = unserved_power_req
-                        hourly_results['sudden_power_drop'] = sudden_power_drop
-                        hourly_results['unserved_power_drop'] = unserved_power_drop
-                        hourly_results['load_shed'] = load_shed
-                        hourly_results['log'] = self.generate_log(y,m,d,h,unserved_power_req, unserved_power_drop,load_shed)
+                power_req = year_power_req[i - first_hour]
+                self.set_bess_parameters(i, starting = True)
+                #power_req += charging_pwr_req
+                #Consumption of sources, update key results in the scenario
+                unserved_power_req, sudden_power_drop = self.calc_src_power_and_energy2(i,power_req)
+                #Use bess only if needed
+                if unserved_power_req > 0:
 
-                        # Sort sources by priority for processing
-                        self.src_list.sort(key=lambda src: src.config['priority'])
-        self.aggregate_data_for_reporting()            
+                   unserved_power_req = self.utilize_reserves(i,unserved_power_req)
 
-    def charge_bess(self, y, m, d, h):
+                if unserved_power_req > 0 and self.bess_non_emergency_use in [1,2] and not self.bess_priority_wise_use:
+                    unserved_power_req = self.bess_non_em_contribution(i,unserved_power_req)
+            
+                unserved_power_drop = 0
+                load_shed = 0
+
+                if unserved_power_req <=0:
+
+                    self.charge_bess(i)
+
+                    if sudden_power_drop > 0:
+
+                        unserved_power_drop,load_shed = self.handle_sudden_power_drop(i, power_req, sudden_power_drop)
+
+                #_ = self.set_bess_parameters(i, starting = False)
+                #fleets hold the hour in their runs until here
+                for fleet in self.plan.fleets:
+                    fleet.store.flush()
+
+                #each hour counts once, or as often as its representative day recurs
+                weight = 1 if hour_weights is None else hour_weights[i - first_hour]
+                if unserved_power_req > 0.01:
+                    year_totals[1] += weight
+                    year_totals[2] += weight
+                if unserved_power_drop > 0.01:
+                    year_totals[2] += weight
+                if load_shed > 0:
+                    year_totals[3] += weight
+
+                if results is not None:
+                    hour_results = results.hour(i)
+                    hour_results['unserved_power_req'] = unserved_power_req
+                    hour_results['sudden_power_drop'] = sudden_power_drop
+                    hour_results['unserved_power_drop'] = unserved_power_drop
+                    hour_results['load_shed'] = load_shed
+                    self.event_log.record(i, unserved_power_req, load_shed)
+                i += 1
+
+                if year_totals[2] > self.critical_budget or year_totals[1] > self.unserved_budget:
+                    #the run can no longer meet the reliability limits, keep what was simulated so far
+                    self.aborted_at_hour = i - 1
+                    if results is not None:
+                        self.event_log.record_source_events(range_start, i, self.src_list)
+                    if rep_days is None:
+                        year_totals[0] = float(year_power_req_array[:i - first_hour].sum())
+                    else:
+                        year_totals[0] = float(year_power_req_array[:i - first_hour] @ rep_days.hour_weights[:i - first_hour])
+                    print(f'Aborting in year {y}: {year_totals[2]} critical load interruptions, {year_totals[1]} unserved hours this year')
+                    if skipped_hour is not None:
+                        self.restore_skipped_hour(range_start, skipped_hour)
+                    return False
+            self.last_simulated_hour = range_end - 1
+            if skipped_hour is not None:
+                self.restore_skipped_hour(range_start, skipped_hour)
+            if results is not None:
+                #failures and sudden drops of the stretch, bulk dispatched hours never have any
+                self.event_log.record_source_events(range_start, range_end, self.src_list)
+
+        self.critical_budget -= year_totals[2]
+        self.unserved_budget -= year_totals[1]
+        return True
+
+    def instrument(self):
+        # Route the hourly steps and reporting passes of this Scenario through the self.stats timers.
+        # Instance attributes shadow the methods, so an unprofiled Scenario pays nothing.
+        stats = self.stats
+        if self.event_log is not None:
+            self.event_log.record = stats.timed('event_log', self.event_log.record)
+        if self.instrumented:
+            return
+        self.instrumented = True
+        for name in PROFILED_PHASES:
+            setattr(self, name, stats.timed(name, getattr(self, name)))
+
+        timed_year = stats.timed('simulate_year', self.simulate_year)
+
+        def simulate_year(y, year_power_req):
+            if y == stats.profile_year:
+                return stats.profile_call(timed_year, y, year_power_req)
+            return timed_year(y, year_power_req)
+
+        self.simulate_year = simulate_year
+
+    def write_profile_stats(self, filepath):
+        # Profile of the run as JSON next to a results file, e.g. data/results.xlsx -> data/results_profile.json
+        if self.stats is not None:
+            self.stats.write_json(os.path.splitext(filepath.rstrip('/\\'))[0] + '_profile.json')
+
+    def resume_bess(self, i):
+        # Hour i follows hours that were not simulated. Each BESS picks up in the state it was in at
+        # the last simulated hour, as if the skipped hours were not there, or starts full if nothing
+        # has been simulated yet. That state stands in for hour i - 1 while hour i is dispatched,
+        # returns the skipped hour's own values for restore_skipped_hour to put back afterwards.
+        prev = self.last_simulated_hour
+        skipped_hour = []
+        for src in self.bess_sources:
+            ops_data = src.ops_data
+            skipped_hour.append((ops_data, ops_data.status[i - 1], ops_data.reserve[i - 1], ops_data.capacity[i - 1]))
+            if prev is None:
+                ops_data.status[i - 1] = 0
+                src.initialize_bess(i - 1)
+            else:
+                ops_data.status[i - 1] = ops_data.status[prev]
+                ops_data.reserve[i - 1] = ops_data.reserve[prev]
+                ops_data.capacity[i - 1] = ops_data.capacity[prev]
+        return skipped_hour
+
+    @staticmethod
+    def restore_skipped_hour(i, skipped_hour):
+        # Hour i - 1 back as resume_bess found it, seeded failures and downtime included
+        for ops_data, status, reserve, capacity in skipped_hour:
+            ops_data.status[i - 1] = status
+            ops_data.reserve[i - 1] = reserve
+            ops_data.capacity[i - 1] = capacity
+
+    def charge_bess(self, i):
         
         #assumption that sim starts with full reserve
         #and a status of 0, so charge req is 0
-        bess_sources = [src for src in self.src_list if src.metadata['type']['value'] == "BESS"]
+        bess_sources = self.bess_sources
 
         if not bess_sources:
             return
+        h = int(HOUR_OF_DAY[i])
         """
         operational_bess_sources = [
             src for src in bess_sources if 
-            src.ops_data[y]['months'][m]['days'][d]['hours'][h]['status'] == 1]
+            src.ops_data.hour(i)['status'] == 1]
         
         if operational_bess_sources:
             return
         
-        if y==1 and m == 1 and d == 1 and h == 0:
+        if i == 0:
             for src in bess_sources:
-                src_hourly_data = src.ops_data[y]['months'][m]['days'][d]['hours'][h]
+                src_hourly_data = src.ops_data.hour(i)
                 src_hourly_data['reserve'] = src_hourly_data['capacity']
                 src_hourly_data['status'] = 0
             return
         """
-        #year, month, day, hour - self.previous_hour(y,m,d,h)
         #find bess charging requirement- consider only those units which are have not been set to discharge.
-        bess_total_charge_req = sum(
-            src.ops_data[y]['months'][m]['days'][d]['hours'][h]['capacity'] - 
-            src.ops_data[y]['months'][m]['days'][d]['hours'][h]['reserve'] 
-            for src in bess_sources
-            if src.ops_data[y]['months'][m]['days'][d]['hours'][h]['status'] not in [1,-1,-2,-3]
-            )
+        #a fleet run counts once per member
+        bess_total_charge_req = 0
+        for src, src_hourly_data in self.unit_records(self.plan.bess_units, i):
+            if src_hourly_data['status'] not in [1,-1,-2,-3]:
+                bess_total_charge_req = add_members(bess_total_charge_req, src_hourly_data['capacity'] - src_hourly_data['reserve'],
+                                                    src_hourly_data.count)
         bess_total_deficit = bess_total_charge_req
         #night time reduction in charging.
         if h > 18 or h < 9:
@@ -353,20 +544,23 @@ class Scenario:
 
         if bess_total_charge_req > 0:
             #for each source group in order of priority.
-            for priority, group in groupby(self.src_list, key=lambda x: x.config['priority']):
+            for group in self.plan.priority_groups:
 
-                sources = list(group)
-                if not sources or sources[0].metadata['type']['value'] == 'BESS':
+                if group.is_bess:
                     continue
 
                 #experiment, what happens if we don't allow diesel to charge BESS during day time.
-                if h > 8 and h < 18 and sources[0].metadata['generic_name']['value'] == "Captive DG Sets":
+                if h > 8 and h < 18 and group.generic_name == "Captive DG Sets":
                     continue
+
+                sources = group.units
                 
                 #finds its reserve capacity.
-                group_total_reserve = sum(src.ops_data[y]['months'][m]['days'][d]['hours'][h]['capacity'] -\
-                                          src.ops_data[y]['months'][m]['days'][d]['hours'][h]['power_output']
-                                        for src in sources if src.ops_data[y]['months'][m]['days'][d]['hours'][h]['status'] not in [-1,-2,-3])
+                group_total_reserve = 0
+                for src, src_hourly_data in self.unit_records(sources, i):
+                    if src_hourly_data['status'] not in [-1,-2,-3]:
+                        group_total_reserve = add_members(group_total_reserve, src_hourly_data['capacity'] - src_hourly_data['power_output'],
+                                                          src_hourly_data.count)
                 if group_total_reserve == 0:
                     continue
             
@@ -378,9 +572,7 @@ class Scenario:
                 remaining_charge_req -= src_group_will_cover
                 all_groups_charging_output += src_group_will_cover
                 #Update Source outputs as a result of BESS charging contribution.
-                for src in sources:
-
-                    src_hourly_data = src.ops_data[y]['months'][m]['days'][d]['hours'][h]
+                for src, src_hourly_data in self.unit_records(sources, i):
 
                     if src_hourly_data['status'] in [-1,-2,-3] or src_hourly_data['capacity'] == 0:
                         
@@ -394,20 +586,16 @@ class Scenario:
                     src_hourly_data['reserve'] = src_hourly_data['capacity'] - src_hourly_data['power_output']
                     src_hourly_data['energy_output'] = src_hourly_data['power_output']
 
-                    src_group_will_cover -= charge_offered
+                    src_group_will_cover = add_members(src_group_will_cover, -charge_offered, src_hourly_data.count)
                 if remaining_charge_req < 0.01:
                     remaining_charge_req = 0
                     break
 
         req_to_avail_ratio = bess_total_deficit / all_groups_charging_output if all_groups_charging_output > 0 else 0
-        for bess_src in bess_sources:
+        for bess_src, bess_src_hourly_data in self.unit_records(self.plan.bess_units, i):
 
-            bess_src_hourly_data = bess_src.ops_data[y]['months'][m]['days'][d]['hours'][h]
-            if y==1 and m == 1 and d == 1 and h == 0:
-                bess_src_prev_hour_data = bess_src.ops_data[y]['months'][m]['days'][d]['hours'][h]
-            else:
-                year, month, day, hour = self.previous_hour(y,m,d,h)
-                bess_src_prev_hour_data = bess_src.ops_data[year]['months'][month]['days'][day]['hours'][hour]
+            #the first hour of the run is its own previous hour
+            bess_src_prev_hour_data = bess_src_hourly_data.previous()
             
             if bess_src_hourly_data['status'] in [-1, -2, -3]:
 
@@ -447,20 +635,23 @@ class Scenario:
                     if bess_src_hourly_data['reserve'] >= bess_src_hourly_data['capacity']:
                         bess_src_hourly_data['reserve'] = bess_src_hourly_data['capacity']
                         bess_src_hourly_data['status'] = 0                         
-                               
-    def utilize_reserves(self, y, m, d, h, remaining_demand):
 
-        for src in self.src_list:
+    def utilize_reserves(self, i, remaining_demand):
+
+        for src, src_hourly_ops_data in self.unit_records(self.plan.non_bess_units, i):
 
-            if src.metadata['type']['value'] == 'BESS':
-                continue
-            src_hourly_ops_data = src.ops_data[y]['months'][m]['days'][d]['hours'][h]
             if src_hourly_ops_data['status'] in [-1, -2,-3] or \
                 src_hourly_ops_data['capacity'] == 0 or \
                     src_hourly_ops_data['reserve'] == 0:
                 continue
-            contribution = min(remaining_demand, src_hourly_ops_data['reserve'])
-            remaining_demand -= contribution
+            #of a fleet run, the members giving their whole reserve go together
+            reserve = src_hourly_ops_data['reserve']
+            n, contribution, remaining_demand = step_members(
+                src_hourly_ops_data.count, remaining_demand,
+                lambda remaining: (min(remaining, reserve), remaining - min(remaining, reserve)),
+                lambda remaining: remaining < 0.01)
+            if n < src_hourly_ops_data.count:
+                src_hourly_ops_data.split(n)
             src_hourly_ops_data['power_output'] += contribution
             src_hourly_ops_data['energy_output'] += contribution
             src_hourly_ops_data['reserve'] -= contribution
@@ -470,49 +661,48 @@ class Scenario:
 
         return remaining_demand
     
-    def handle_sudden_power_drop(self, y, m, d, h, initial_deficit_power):
+    def handle_sudden_power_drop(self, i, power_req, initial_deficit_power):
 
         deficit_power = initial_deficit_power
         load_shed = 0
         non_critical_load_projection = Project.load_projection[1]['total_load'] - Project.load_projection[1]['critical_load']         
-        running_load_factor = Project.load_data[y][m][d][h] / Project.load_projection[1]['total_load']
+        running_load_factor = power_req / Project.load_projection[1]['total_load']
         if running_load_factor > 1:
             running_load_factor = 1
         
         sheddable_load = non_critical_load_projection * running_load_factor
 
-        # Sort sources by block_load_acceptance for effective grouping
-        self.src_list.sort(key=lambda src: src.metadata.get('block_load_acceptance', {'value': 0})['value'], reverse = True)
-        
-        # Group sources by their block_load_acceptance, considering only operational sources
-        for block_acceptance, group in groupby(self.src_list, key=lambda src: src.metadata.get('block_load_acceptance', {'value': 0})['value']):
+        # Groups of sources by block_load_acceptance, highest first. Zero acceptance groups are
+        # already left out of the plan, which filters out all solar sources, which is correct.
+        for group in self.plan.block_acceptance_groups:
             
-            sources = list(group)
-            #the block acceptance == 0 condition will filter out all solar sources, which is correct.
-            if not sources or sources[0].metadata['block_load_acceptance']['value'] == 0: 
-                continue
-
-            if sources[0].metadata['type']['value'] != 'BESS': 
-                sources = list(filter(lambda src: src.ops_data[y]['months'][m]['days'][d]['hours'][h]['status'] == 1, sources))
-            else:
+            block_acceptance = group.key
+            sources = []
+
+            # considering only operational sources, as (source, hour record) pairs
+            for src, src_hourly_ops_data in self.unit_records(group.units, i):
+                if not group.is_bess:
+                    if src_hourly_ops_data['status'] == 1:
+                        sources.append((src, src_hourly_ops_data))
                 #only BESS can respond to sudden changes regardless of state
-                sources = list(filter(lambda src: src.ops_data[y]['months'][m]['days'][d]['hours'][h]['status'] not in [-1,-2,-3], sources))    
+                elif src_hourly_ops_data['status'] not in [-1,-2,-3]:
+                    sources.append((src, src_hourly_ops_data))
 
             if not sources:
                 continue  # Skip groups with no operational sources
 
-            deficit_power = self.distribute_deficit_among_sources(y, m, d, h, sources, deficit_power, block_acceptance)
+            deficit_power = self.distribute_deficit_among_sources(i, sources, deficit_power, block_acceptance)
 
             # Check if deficit is fully managed
             if deficit_power <= 0:
                 break
 
         # Adjust sources with status -1 and 0.5, setting their output and reserve to 0
-        for src in self.src_list:
-            if src.ops_data[y]['months'][m]['days'][d]['hours'][h]['status'] == -1: 
-                src.ops_data[y]['months'][m]['days'][d]['hours'][h]['power_output'] = 0
-                src.ops_data[y]['months'][m]['days'][d]['hours'][h]['energy_output'] = 0
-                src.ops_data[y]['months'][m]['days'][d]['hours'][h]['reserve'] = 0
+        for src, src_hourly_ops_data in self.unit_records(self.plan.units, i):
+            if src_hourly_ops_data['status'] == -1:
+                src_hourly_ops_data['power_output'] = 0
+                src_hourly_ops_data['energy_output'] = 0
+                src_hourly_ops_data['reserve'] = 0
             
 
         # Handle remaining deficit with load shedding
@@ -523,27 +713,39 @@ class Scenario:
 
         return deficit_power, load_shed
 
-    def distribute_deficit_among_sources(self, y, m, d, h, sources, deficit, block_acceptance):
-
-        src_group_block_acceptance = sum(src.config['rating'] * (block_acceptance / 100) for src in sources)
+    def distribute_deficit_among_sources(self, i, sources, deficit, block_acceptance):
 
-        src_group_reserve = sum(src.ops_data[y]['months'][m]['days'][d]['hours'][h]['reserve'] for src in sources)
+        #sources holds (source, hour i record) pairs, a fleet run counts once per member
+        src_group_block_acceptance = 0
+        src_group_reserve = 0
+        for src, src_hourly_ops_data in sources:
+            src_group_block_acceptance = add_members(src_group_block_acceptance, src.config['rating'] * (block_acceptance / 100),
+                                                     src_hourly_ops_data.count)
+            src_group_reserve = add_members(src_group_reserve, src_hourly_ops_data['reserve'], src_hourly_ops_data.count)
 
         # Calculate how much of the deficit can be covered
         contribution = min(src_group_block_acceptance, deficit, src_group_reserve)
         if contribution == 0:
             return deficit
         
-        for src in sources:
-            src_hourly_ops_data = src.ops_data[y]['months'][m]['days'][d]['hours'][h]
+        n = 0
+        while n < len(sources):
+            src, src_hourly_ops_data = sources[n]
+            n += 1
             # Calculate each source's contribution based on its reserve
             src_contribution = (src_hourly_ops_data['reserve']/ src_group_reserve) * contribution
+            #of a fleet run, the members before the one that covers the deficit go together
+            members, _, deficit = step_members(src_hourly_ops_data.count, deficit,
+                                               lambda remaining: (src_contribution, max(0, remaining - src_contribution)),
+                                               lambda remaining: remaining <= 0.01)
+            if members < src_hourly_ops_data.count:
+                sources.insert(n, (src, src_hourly_ops_data.split(members)))
             contrib_ratio = src_contribution/ src_hourly_ops_data['reserve'] if src_contribution > 0 else 0
             src_hourly_ops_data['power_output'] += src_contribution
             src_hourly_ops_data['energy_output'] += src_contribution
             src_hourly_ops_data['reserve'] -= src_contribution
             
-            if src.metadata['type']['value'] == 'BESS':
+            if src.spec.is_bess:
                 original_state = src_hourly_ops_data['status']
                 if src_contribution > 0:
                     src_hourly_ops_data['status'] = 1
@@ -554,27 +756,22 @@ class Scenario:
                         src_hourly_ops_data['status'] = original_state
                         src_hourly_ops_data['reserve'] += src_contribution
 
-            deficit = max(0,deficit - src_contribution)
-
             if deficit <= 0.01:
                 deficit = 0
                 break
         return deficit
-    
-    def set_bess_parameters(self, y, m, d, h, starting):
+
+    def set_bess_parameters(self, i, starting):
 
         #assumption that sim starts with full reserve
         #and a status of 0, so charge req is 0
-        if y==1 and m == 1 and d == 1 and h == 0 and starting:
+        if i == 0 and starting:
             return
         
-        #extract BESS sources
-        bess_sources = [src for src in self.src_list if src.metadata['type']['value'] == 'BESS']
-        #iterate over sources
+        #iterate over sources, a fleet run of BESS is set in one go
         #bess_charging_energy = 0
-        for src in bess_sources:
+        for src, src_hourly_data in self.unit_records(self.plan.bess_units, i):
 
-            src_hourly_data = src.ops_data[y]['months'][m]['days'][d]['hours'][h]
             #i -1 and -2, -3, then capacity and reserve =0
         
             if src_hourly_data['status'] in [-1, -2, -3]:
@@ -585,8 +782,7 @@ class Scenario:
 
                 if starting:
                     #check reserve for previous hour.
-                    year, month, day, hour = self.previous_hour(y,m,d,h)
-                    src_prev_hour_data = src.ops_data[year]['months'][month]['days'][day]['hours'][hour]
+                    src_prev_hour_data = src_hourly_data.previous()
                     #whatever the status of previous hour.
                     #we don't know whether this can be charged, used, etc.
                     #so we have to put it on neutral state
@@ -597,45 +793,26 @@ class Scenario:
                         src_hourly_data['reserve'] = src_prev_hour_data['reserve']
                         #bess_charging_energy += src_hourly_data['capacity'] * 0.01
 
-
-    def generate_log(self, y, m, d, h, unserved_power_req, deficit_power,load_shed):
-
-        # Identifying failed and reduced output sources
-        failed_sources = [src for src in self.src_list if src.ops_data[y]['months'][m]['days'][d]['hours'][h]['status'] == -1]
-        reduced_output_sources = [src for src in self.src_list if src.ops_data[y]['months'][m]['days'][d]['hours'][h]['status'] == 0.5]
-        
-        # Constructing the explanation message
-        log_parts = []
-
-        if unserved_power_req > 0:
-
-            full_explanation = f"Total power requirements could not be satisfied. Shortfall = {round(unserved_power_req,3)} MW"
-            return full_explanation
-    
-        if failed_sources:
-
-            log_parts.append("Failures in sources " + ", ".join([f"{src.config['rating']} {src.config['rating_unit']} {src.name}" for src in failed_sources]))
-        
-        if reduced_output_sources:
-
-            log_parts.append("sudden reductions in sources " + ", ".join([f"{src.config['rating']} {src.config['rating_unit']} {src.name}" for src in reduced_output_sources]))
-        if load_shed > 0:
-
-            log_parts.append(f"{load_shed} MW load was shed")
-
-        # Combine all parts for the final explanation
-        full_log = "; ".join(log_parts)
-        if full_log == '':
-            full_log = "Normal Operation"
-        return full_log
+    def hourly_log(self, i):
+        # Human readable operations log of absolute hour i
+        if self.event_log is None:
+            raise ValueError("No hourly log is kept for a kpi_only Scenario")
+        return self.event_log.message(i, self.src_list)
 
     def aggregate_data_for_reporting(self):
 
+        #with representative days every simulated day stands for day_weights days of the run
+        day_weights = None if self.representative_days is None else self.representative_days.run_day_weights
+        if self.kpi_only:
+            for src in self.src_list:
+                src.aggregate_year_costs(day_weights)
+            self.aggregate_yearly_kpi_data()
+            self.calculate_scenario_kpis()
+            return
+
         for src in self.src_list:
 
-            src.aggregate_day_stats()
-            src.aggregate_month_stats()
-            src.aggregate_year_stats()
+            src.aggregate_stats(day_weights)
         self.aggregate_yearly_data_for_csv2()
         self.calculate_scenario_kpis()
 
@@ -657,80 +834,73 @@ class Scenario:
             'Critical Load Interruptions (No.)': critical_load_interr,
             'Estimated Interruption Loss (M $)': interr_loss,
             'Non-critical Load shedding events': load_shed_events,
+            #True when simulate stopped early on the abort limits, the figures then only cover the years simulated
+            'Aborted': self.aborted_at_hour is not None,
         }
 
-    def aggregate_yearly_data_for_csv(self):
-        
-        self.yearly_results.clear()
-        for y in range(1, 13):
-            total_energy_req = 0
-            unserved_instances = 0
-            critical_load_interruptions = 0
-            load_shed_events = 0
-
-            # Summing total energy requirements
-            for m in range(1, 13):
-                if m == 2:  # February
-                    days = 28
-                elif m in [4, 6, 9, 11]:  # April, June, September, November
-                    days = 30
-                else:  # All other months
-                    days = 31
-
-                for d in range(1, days+1):  # Assuming 31 days for simplicity; adjust as needed
-                    for h in range(24):
-                        hour_data = self.hourly_results[y][m][d][h]
-                        total_energy_req += hour_data['power_req']
-                        if hour_data['unserved_power_req'] > 0.01:
-                            unserved_instances += 1
-                            critical_load_interruptions += 1
-                        if hour_data['unserved_power_drop'] > 0.01:
-                            critical_load_interruptions += 1
-                        if hour_data['load_shed'] > 0:
-                            load_shed_events +=1
-            # Calculate Energy Fulfilment Ratio (%)
-            total_rows = 365 * 24  # Simplified; adjust for actual days in each month/year
-            energy_fulfilment_ratio = 100 * (1 - (unserved_instances / total_rows))
-
-            # Calculate Estimated Loss due to Interruptions
-            estimated_loss_due_to_interruptions = (critical_load_interruptions * Project.site_data['loss_during_failure'])/1000000
-
-            # Initialize variable for total cost of operation across all sources
-            total_cost_of_operation = 0
-
-            # Aggregate total cost of operation from each source for the year
-            for src in self.src_list:
-                source_year_data = src.ops_data.get(y, {})
-                total_cost_of_operation += source_year_data.get('year_cost_of_operation', 0)
+    def year_result_totals(self, y):
+        # Energy requirement, unserved hours, critical load interruptions and load shedding events of year y,
+        # tallied by simulate as it goes
+        total_energy_req, unserved_instances, critical_load_interruptions, load_shed_events = self.year_totals[y]
+        return total_energy_req, unserved_instances, critical_load_interruptions, load_shed_events
 
-            total_cost_m_pkr = estimated_loss_due_to_interruptions + total_cost_of_operation 
+    def year_summary(self, y):
+        # Scenario level record of year y, the part of yearly_results the KPIs are calculated from
+        total_energy_req, unserved_instances, critical_load_interruptions, load_shed_events = self.year_result_totals(y)
 
-            # Calculate Unit Cost ($/kWh), ensuring no division by zero
-            if total_energy_req > 0:
-                unit_cost_pkr_per_kwh = (total_cost_m_pkr * 1000) / total_energy_req
-            else:
-                unit_cost_pkr_per_kwh = 0  # Avoid division by zero
+        # Calculate Energy Fulfilment Ratio (%)
+        total_rows = HOURS_PER_YEAR
+        energy_fulfilment_ratio = 100 * (1 - (unserved_instances / total_rows))
+
+        # Calculate Estimated Loss due to Interruptions
+        estimated_loss_due_to_interruptions = (critical_load_interruptions * Project.site_data['loss_during_failure']) / 1000000
+
+        # Initialize variable for total cost of operation across all sources
+        total_cost_of_operation = 0
+
+        # Aggregate total cost of operation from each source for the year
+        for src in self.src_list:
+            source_year_data = src.ops_data.get(y, {})
+            total_cost_of_operation += source_year_data.get('year_cost_of_operation', 0)
 
-            year_record = {
+        total_cost_m_pkr = estimated_loss_due_to_interruptions + total_cost_of_operation 
+
+        # Calculate Unit Cost ($/kWh), ensuring no division by zero
+        if total_energy_req > 0:
+            overall_unit_cost = (total_cost_m_pkr * 1000) / total_energy_req
+        else:
+            overall_unit_cost = 0  # Avoid division by zero
+
+        return {
             'year': y,
-            'total_energy_requirement (MWh)': round(total_energy_req,2),
-            'Energy Fulfilment Ratio (%)': round(energy_fulfilment_ratio,2),
-            'Critical Load Interruptions': round(critical_load_interruptions,2),
-            'Estimated Loss due to Interruptions': round(estimated_loss_due_to_interruptions,2),
+            'total_energy_requirement (MWh)': round(total_energy_req, 2),
+            'Energy Fulfilment Ratio (%)': round(energy_fulfilment_ratio, 2),
+            'Critical Load Interruptions': round(critical_load_interruptions, 2),
+            'Estimated Loss due to Interruptions': round(estimated_loss_due_to_interruptions, 2),
             'Non-critical Load shedding events': load_shed_events,
-            'Total Cost (M $)': round(total_cost_m_pkr,2),
-            'Unit Cost ($/kWh)': round(unit_cost_pkr_per_kwh,2)
-            }
+            'Total Cost (M $)': round(total_cost_m_pkr, 2),
+            'Unit Cost ($/kWh)': round(overall_unit_cost, 2)
+        }
+
+    def aggregate_yearly_kpi_data(self):
+        # yearly_results without the per source breakdown, used in kpi_only mode
+        self.yearly_results = [self.year_summary(y) for y in self.year_totals]
+
+    def aggregate_yearly_data_for_csv(self):
+        
+        self.yearly_results.clear()
+        for y in self.year_totals:
+            year_record = self.year_summary(y)
 
             # Aggregate data for each source
             source_data = []
             for index, src in enumerate(self.src_list, start=1):
                 source_year_data = src.ops_data.get(y, {})
                 source_energy_output = source_year_data.get('year_energy_output', 0)
-                source_op_proportion = source_year_data.get('year_operation_hours', 0) / (365 * 24)
+                source_op_proportion = source_year_data.get('year_operation_hours', 0) / HOURS_PER_YEAR
                 source_total_cost = source_year_data.get('year_cost_of_operation', 0)
                 source_unit_cost = source_year_data.get('year_unit_cost', 0)
-                source_name = f"SRC-{index} {src.metadata['generic_name']['value']}"
+                source_name = f"SRC-{index} {src.spec.generic_name}"
                 
                 source_data.append({
                     f'{source_name} energy output (MWh)': round(source_energy_output,2),
@@ -745,73 +915,15 @@ class Scenario:
     def aggregate_yearly_data_for_csv2(self):
 
         self.yearly_results.clear()
-        for y in range(1, 13):
-            total_energy_req = 0
-            unserved_instances = 0
-            critical_load_interruptions = 0
-            load_shed_events = 0
-
-            # Summing total energy requirements
-            for m in range(1, 13):
-                if m == 2:  # February
-                    days = 28
-                elif m in [4, 6, 9, 11]:  # April, June, September, November
-                    days = 30
-                else:  # All other months
-                    days = 31
-
-                for d in range(1, days+1):
-                    for h in range(24):
-                        hour_data = self.hourly_results[y][m][d][h]
-                        total_energy_req += hour_data['power_req']
-                        if hour_data['unserved_power_req'] > 0.01:
-                            unserved_instances += 1
-                            critical_load_interruptions += 1
-                        if hour_data['unserved_power_drop'] > 0.01:
-                            critical_load_interruptions += 1
-                        if hour_data['load_shed'] > 0:
-                            load_shed_events += 1
-
-            # Calculate Energy Fulfilment Ratio (%)
-            total_rows = 365 * 24
-            energy_fulfilment_ratio = 100 * (1 - (unserved_instances / total_rows))
-
-            # Calculate Estimated Loss due to Interruptions
-            estimated_loss_due_to_interruptions = (critical_load_interruptions * Project.site_data['loss_during_failure']) / 1000000
-
-            # Initialize variable for total cost of operation across all sources
-            total_cost_of_operation = 0
-
-            # Aggregate total cost of operation from each source for the year
-            for src in self.src_list:
-                source_year_data = src.ops_data.get(y, {})
-                total_cost_of_operation += source_year_data.get('year_cost_of_operation', 0)
-
-            total_cost_m_pkr = estimated_loss_due_to_interruptions + total_cost_of_operation 
-
-            # Calculate Unit Cost ($/kWh), ensuring no division by zero
-            if total_energy_req > 0:
-                overall_unit_cost = (total_cost_m_pkr * 1000) / total_energy_req
-            else:
-                overall_unit_cost = 0  # Avoid division by zero
-
-            year_record = {
-                'year': y,
-                'total_energy_requirement (MWh)': round(total_energy_req, 2),
-                'Energy Fulfilment Ratio (%)': round(energy_fulfilment_ratio, 2),
-                'Critical Load Interruptions': round(critical_load_interruptions, 2),
-                'Estimated Loss due to Interruptions': round(estimated_loss_due_to_interruptions, 2),
-                'Non-critical Load shedding events': load_shed_events,
-                'Total Cost (M $)': round(total_cost_m_pkr, 2),
-                'Unit Cost ($/kWh)': round(overall_unit_cost, 2)
-            }
+        for y in self.year_totals:
+            year_record = self.year_summary(y)
 
             # Initialize variables for aggregation
             source_aggregates = {}
 
             # Aggregate total cost of operation and energy output from each source for the year by generic name
             for src in self.src_list:
-                generic_name = src.metadata['generic_name']['value']
+                generic_name = src.spec.generic_name
                 if generic_name not in source_aggregates:
                     source_aggregates[generic_name] = {'total_cost': 0, 'total_energy': 0}
 
@@ -840,24 +952,17 @@ class Scenario:
 
         # Iterate over each source in the source list
         for src in self.src_list:
-            generic_name = src.metadata['generic_name']['value']
+            generic_name = src.spec.generic_name
 
             # Initialize the generic source name if not already done
             if generic_name not in output_by_source:
                 output_by_source[generic_name] = {'all_years': 0}
 
-            # Access each year in the ops_data of the source
+            # Sum power output over the hours of each year
             for y in src.ops_data:
-                if y not in output_by_source[generic_name]:
-                    output_by_source[generic_name][y] = 0
-
-                # Sum power output for each month, day, and hour
-                for m in src.ops_data[y]['months']:
-                    for d in src.ops_data[y]['months'][m]['days']:
-                        for h in src.ops_data[y]['months'][m]['days'][d]['hours']:
-                            power_output = src.ops_data[y]['months'][m]['days'][d]['hours'][h].get('power_output', 0)
-                            output_by_source[generic_name][y] += power_output
-                            output_by_source[generic_name]['all_years'] += power_output
+                year_output = float(src.ops_data.power_output[year_slice(y)].sum())
+                output_by_source[generic_name][y] = output_by_source[generic_name].get(y, 0) + year_output
+                output_by_source[generic_name]['all_years'] += year_output
 
         # Print the results
         for generic_name in sorted(output_by_source):
@@ -874,6 +979,7 @@ class Scenario:
                 dict_writer = csv.DictWriter(output_file, keys)
                 dict_writer.writeheader()
                 dict_writer.writerows(self.yearly_results)
+            self.write_profile_stats(filepath)
 
     import pandas as pd
 
@@ -889,101 +995,73 @@ class Scenario:
             except FileNotFoundError:
                 # If the file does not exist, create a new one
                 df.to_excel(filepath, sheet_name='Yearly Data', index=False)
+            self.write_profile_stats(filepath)
 
-    def write_hourly_data_to_csv(self):
-     
-        # Prepare data for DataFrame
-        data = []
-        # Assuming the first source has all the necessary time periods defined
-        first_src_ops_data = self.src_list[0].ops_data
-
-        for y in first_src_ops_data:
-            for m in first_src_ops_data[y]['months']:
-                for d in first_src_ops_data[y]['months'][m]['days']:
-                    for h in first_src_ops_data[y]['months'][m]['days'][d]['hours']:
-                        row = [y, m, d, h]
-                        for src in self.src_list:
-                            ops_data = src.ops_data[y]['months'][m]['days'][d]['hours'][h]
-                            # Append ops_data values for the source
-                            row.extend([
-                                round(ops_data.get('capacity', 0),2),
-                                round(ops_data.get('power_output', 0),2),
-                                round(ops_data.get('energy_output', 0),2),
-                                round(ops_data.get('reserve', 0),2),
-                                ops_data.get('status', '')
-                            ])
-                        # Append results data for the same time period
-                        result_data = self.hourly_results[y][m][d][h]
-                        row.extend([
-                            round(result_data.get('power_req', 0),2),
-                            round(result_data.get('unserved_power_req', 0),2),
-                            round(result_data.get('sudden_power_drop', 0),2),
-                            round(result_data.get('unserved_power_drop', 0),2),
-                            round(result_data.get('load_shed', 0),3),
-                            result_data.get('log', 0)
-                        ])
-                        data.append(row)
-
-        # Define column names, including results column names
-        column_names = ['Year', 'Month', 'Day', 'Hour']
-        for i in range(1, len(self.src_list) + 1):
-            column_names.extend([f'Src_{i}_power_capacity', f'Src_{i}_power_output', f'Src_{i}_energy_output', f'Src_{i}_spin_reserve', f'Src_{i}_status'])
-        # Extend column names with results column names
-        column_names.extend(['Power_Req','Unserved_Power_Req', 'Sudden_Power_Drop', 'Unserved_Power_Drop', 'Load_Shed', 'Log'])
-
-        # Create DataFrame
-        df = pd.DataFrame(data, columns=column_names)
-
-        # Write to CSV
-        df.to_csv('data/hourly_data.csv', index=False)
-
-
-    def advance_hour(self,y,m,d,h, src):
-
-        hour = h
-        day = d
-        month = m
-        year = y
-        hour = h + 1
-        if hour > 23:
-            hour = 0
-            day = d + 1
-            if day > len(src.ops_data[y]['months'][m]['days']):
-                day = 1
-                month = m + 1
-                if month > 12:
-                    month = 1
-                    year = y+1 if y < 12 else 12
-        return year, month, day, hour
-
-    def previous_hour(self, y, m, d, h):
-        hour = h - 1
-        day = d
-        month = m
-        year = y
-        
-        # Handle hour rollover
-        if hour < 0:
-            hour = 23
-            day -= 1
-
-        # Handle day rollover
-        if day == 0:
-            month -= 1
-            if month == 0:
-                month = 12
-                year -= 1
-                # Ensure year does not go below 1
-                if year < 1:
-                    year = 1
-                    
-            # Determine the last day of the month
-            if month == 2:
-                day = 28
-            elif month in [4, 6, 9, 11]:
-                day = 30
-            else:
-                day = 31
+    def hourly_data_chunks(self, period='year'):
+        """
+        Hourly trace of every source and the scenario results as one DataFrame per year,
+        or per month with period='month', in calendar order. Chunks are built on demand
+        so only one is held in memory at a time.
+        """
+        if period not in ('year', 'month'):
+            raise ValueError(f"Unsupported hourly export period: {period}")
+        if self.hourly_results is None:
+            raise ValueError("No hourly results are kept for a kpi_only Scenario")
+
+        for y in range(1, NUM_YEARS + 1):
+            month_groups = [range(1, 13)] if period == 'year' else [[m] for m in range(1, 13)]
+            for months in month_groups:
+                first = hour_index(y, months[0], 1, 0)
+                hours = slice(first, first + sum(len(month_days(m)) for m in months) * HOURS_PER_DAY)
+
+                columns = {
+                    'Year': HOUR_YEAR[hours],
+                    'Month': HOUR_MONTH[hours],
+                    'Day': HOUR_DAY[hours],
+                    'Hour': HOUR_OF_DAY[hours],
+                }
+                for n, src in enumerate(self.src_list, start=1):
+                    ops_data = src.ops_data
+                    columns[f'Src_{n}_power_capacity'] = ops_data.capacity[hours].round(2)
+                    columns[f'Src_{n}_power_output'] = ops_data.power_output[hours].round(2)
+                    columns[f'Src_{n}_energy_output'] = ops_data.energy_output[hours].round(2)
+                    columns[f'Src_{n}_spin_reserve'] = ops_data.reserve[hours].round(2)
+                    columns[f'Src_{n}_status'] = ops_data.status[hours]
+
+                results = self.hourly_results
+                columns['Power_Req'] = [round(value, 2) for value in results.power_req[hours].tolist()]
+                columns['Unserved_Power_Req'] = [round(value, 2) for value in results.unserved_power_req[hours].tolist()]
+                columns['Sudden_Power_Drop'] = [round(value, 2) for value in results.sudden_power_drop[hours].tolist()]
+                columns['Unserved_Power_Drop'] = [round(value, 2) for value in results.unserved_power_drop[hours].tolist()]
+                columns['Load_Shed'] = [round(value, 3) for value in results.load_shed[hours].tolist()]
+                columns['Log'] = [self.hourly_log(i) for i in range(hours.start, hours.stop)]
+
+                yield pd.DataFrame(columns)
+
+    def write_hourly_data_to_csv(self, filepath='data/hourly_data.csv', file_format='csv', period='year'):
+        """
+        Stream the hourly trace to disk one year (or month) at a time so memory stays bounded
+        whatever the number of sources. 'csv' writes a single file at filepath, 'parquet' treats
+        filepath as a directory and writes one year=<y> partition per simulation year.
+        """
+        if file_format not in ('csv', 'parquet'):
+            raise ValueError(f"Unsupported hourly export format: {file_format}")
+
+        for n, chunk in enumerate(self.hourly_data_chunks(period)):
+
+            if file_format == 'csv':
+                chunk.to_csv(filepath, index=False, mode='w' if n == 0 else 'a', header=n == 0)
+                continue
+
+            y = int(chunk['Year'].iloc[0])
+            month = int(chunk['Month'].iloc[0])
+            partition = os.path.join(filepath, f'year={y}')
+            if month == 1:
+                #start the partition afresh so parts of an earlier export do not linger
+                os.makedirs(partition, exist_ok=True)
+                for file_name in os.listdir(partition):
+                    if file_name.endswith('.parquet'):
+                        os.remove(os.path.join(partition, file_name))
+            chunk.to_parquet(os.path.join(partition, f'part-{month:02d}.parquet'), index=False)
+        self.write_profile_stats(filepath)
 
-        return year, month, day, hour
-    
@@ -1,10 +1,16 @@
-from project import Project
-from scenario import Scenario
-from sources2 import Source, SourceManager
-import pandas as pd
+import evaluation
+from checkpoint import save_checkpoint, load_checkpoint
+import os
+import sys
 import time
 import random
 
+#run seed of the GA and of the failure and solar drop draws. Every unit's stream is derived from it
+#(see evaluation.build_sources), so a chromosome gets the same fitness in every generation and worker
+#and a rerun repeats the whole search
+seed = 0
+random.seed(seed)
+
 
 # SRC QTY
 src_1_qts = [0, 1]
@@ -90,11 +96,25 @@ for pop in range(len(population)):
     src_2_prts = [3, 4, 5]
     population[pop] = zeros_sequence
 
-source_manager = None
 results = []
 select_list = []
 
 nb_gens = 4
+#worker processes for fitness evaluation, 1 runs everything in this process
+nb_workers = os.cpu_count()
+#number of evaluated genomes remembered across generations, 0 disables the cache
+fitness_cache_size = 1024
+#reliability gate of the fitness function, simulations stop early once the interruption limit is passed
+min_energy_fulfillment = 99
+max_critical_interruptions = 1
+#multi fidelity racing, off by default: candidates are first scored on these subsets of years, the best third
+#of each level moves on and only the survivors of the last level get the full 12 year run, e.g.
+#[(6, 12), (3, 6, 9, 12)]. Candidates dropped on the way get an inf fitness. None runs everyone in full.
+racing_levels = None
+racing_keep_fraction = 1/3
+#state after every generation is saved here, run with --resume to continue from it after a crash
+checkpoint_file = 'data/ga_checkpoint.pkl.gz'
+resume = '--resume' in sys.argv
 
 def mutation(crossed_indivs, threshold_mutate=0.1):
     for i in range(len(crossed_indivs)):
@@ -159,98 +179,72 @@ def rank_pop(fitness_values):
 
 
 def fitness(individual):
-    if individual['Energy Fulfillment Ratio (%)'] >= 99 & individual['Critical Load Interruptions (No.)'] <=1:
+    #a candidate dropped in a race was only scored on a subset of years, it never beats a full run
+    full_run_level = len(racing_levels) if racing_levels else 0
+    if individual.get('Racing Level', full_run_level) < full_run_level:
+        return float('inf')
+    return racing_score(individual)
+
+def racing_score(individual):
+    #fitness on whatever years were simulated, ranks candidates within one racing level
+    if individual.get('Aborted'):
+        return float('inf')
+    if individual['Energy Fulfillment Ratio (%)'] >= min_energy_fulfillment and individual['Critical Load Interruptions (No.)'] <= max_critical_interruptions:
         return individual['Average Unit Cost ($/kWh)']*0.9 + individual['Estimated Interruption Loss (M $)'] * 0.1
     else:
         return float('inf')
 
 
 
-def read_prereq_data():
-    try:
-        global source_manager
-        print('Reading Pre req data')
-        Project.read_load_projection("data")
-        Project.read_load_solar_data_from_folder('data/load_solar_profile')
-        Project.create_load_data()
-        source_manager = SourceManager('data/input_data.xlsx')
-        return True
-    except Exception as e:
-        print('Pre req data could not be loaded.')
-        return False
-
-def set_baseline_src_config(population):
-    
-    #configure(self, start_year, end_year,rating, rating_unit, 
-    #spin_reserve, priority, min_loading, max_loading):
-    
-    #5MW solar plant (SRC_4)
-    #9 x 1.5MW Captive Gas Generators (SRC_6)
-    sources = []
-    
-    #==========================================
-    #5MW existing solar plant SRC_4
-
-    
-
-    for i in range(6):
-        for j in range(int(population[begin[i]])):
-            src = source_manager.get_source_types_by_name('SRC_'+str(i+1))
-            src.configure(start_year=int(population[begin[i]+j+2]), end_year = 12,rating=5, rating_unit='MWh', spin_reserve=0, 
-                        priority=int(population[begin[i]+1]), min_loading=0, max_loading=100)
-            sources.append(src)
-    
-    # print(pop)
-    # print(len(sources))
-    # for sourc in sources:
-    #     print(sourc.name, sourc.config)
-    
-
-    return sources
-    
-
 # Main program
 if __name__ == "__main__":
 
     start_time = time.time()
-    if read_prereq_data():
+    #BESS non-Em mode: 0 means none, 1 means yes with equal distribution, 2 means yes with selection utilization
+    scenario_params = dict(
+        name = "Baseline", 
+        client_name = "Engro",
+        spin_reserve_perc=0,
+        bess_non_emergency_use=2,
+        bess_charge_hours=1,
+        bess_priority_wise_use=True,
+        charge_ratio_night=2.5,
+        abort_critical_interruptions=max_critical_interruptions
+        )
+    try:
+        evaluator = evaluation.Evaluator(scenario_params, data_folder='data', workers=nb_workers, seed=seed, cache_size=fitness_cache_size,
+                                         racing_levels=racing_levels, keep_fraction=racing_keep_fraction, score=racing_score)
+    except Exception as e:
+        print(f'Pre req data could not be loaded: {e}')
+        evaluator = None
+
+    if evaluator is not None:
         print('Prereq data is loaded')
         output_filepath = 'data/summary_output.xlsx'
         nex_gen = population
-        for k in range(nb_gens+1):
-            results = []
-            select_list = []
-            for i in range(len(nex_gen)):
-                src_list = set_baseline_src_config(nex_gen[i])
-                print('sources created and configured')
-                #BESS non-Em mode: 0 means none, 1 means yes with equal distribution, 2 means yes with selection utilization
-                sc = Scenario(
-                    name = "Baseline", 
-                    client_name = "Engro",
-                    selected_sources=src_list,
-                    spin_reserve_perc=0,
-                    bess_non_emergency_use=2,
-                    bess_charge_hours=1,
-                    bess_priority_wise_use=True,
-                    charge_ratio_night=2.5
-                    )
-                print('scenario created, starting simulation')
-                
-                sc.simulate()
-                # print('simulation complete.')
-                # print('printing yearly summary')
-                # sc.write_yearly_data_to_csv2(output_filepath)
-                # print('printing complete')
-                # print('printing hourly data')
-                # #sc.write_hourly_data_to_csv()
-                # print('printing complete')
-                # print('Scenario KPIs below:')
-                # print(sc.scenario_kpis)
-                sc.aggregate_power_output_by_source_and_year()
-                results.append(sc.scenario_kpis)
-                select_list.append(fitness(sc.scenario_kpis))
-            if k < nb_gens:
-                nex_gen = mutation(crossover(selection(rank_pop(select_list), nex_gen)))
+        first_gen = 0
+        checkpoint = load_checkpoint(checkpoint_file) if resume else None
+        if checkpoint is not None:
+            #finished generations are not evaluated again, the cache spares repeats in the next ones
+            print(f"Resuming after generation {checkpoint['generation']} from {checkpoint_file}")
+            first_gen = checkpoint['generation'] + 1
+            nex_gen = checkpoint['next_population']
+            results = checkpoint['results']
+            select_list = checkpoint['fitness']
+            random.setstate(checkpoint['random_state'])
+            evaluator.cache.load(checkpoint['cache'])
+        with evaluator:
+            for k in range(first_gen, nb_gens+1):
+                print(f'Evaluating generation {k} on {evaluator.workers} worker(s)')
+                results = evaluator.evaluate(nex_gen)
+                select_list = [fitness(kpis) for kpis in results]
+                print(f'Fitness cache: {evaluator.cache.stats()}')
+                #crossover edits the selected chromosomes in place, keep this generation as evaluated
+                evaluated = [list(individual) for individual in nex_gen]
+                if k < nb_gens:
+                    nex_gen = mutation(crossover(selection(rank_pop(select_list), nex_gen)))
+                save_checkpoint(checkpoint_file, generation=k, population=evaluated, results=results, fitness=select_list,
+                                next_population=nex_gen, random_state=random.getstate(), cache=evaluator.cache.dump())
 
         
 
@@ -1,20 +1,69 @@
+import numpy as np
 import pandas as pd
-import random
+from collections import namedtuple
+from types import MappingProxyType
 from project import Project
+from ops_store import OpsStore
+from time_axis import NUM_YEARS, NUM_DAYS, DAYS_PER_YEAR, HOURS_PER_DAY, HOURS_PER_YEAR, sum_days_by_month
+
+# Technical and economic parameters of a source type, read once from the input sheet and shared by
+# every unit of that type. Parameters the sheet has no row for are 0, annual_degradation is None
+# when the type does not degrade. metadata keeps the full attribute -> {'unit', 'value'} table
+# for reporting, as read only mappings.
+SourceSpec = namedtuple('SourceSpec', [
+    'name', 'generic_name', 'type', 'finance', 'is_bess', 'block_load_acceptance',
+    'num_annual_fails', 'downtime_per_fail', 'solar_sudden_drops', 'annual_degradation',
+    'capital_cost_baseline', 'useful_life', 'inflation_rate', 'min_annual_off_take',
+    'fuel_consumption', 'fuel_cost', 'tariff_baseline_fixed', 'tariff_baseline_var',
+    'opex_baseline_fixed', 'opex_baseline_var', 'metadata'])
+
+
+def parse_source_spec(name, attributes, units, values):
+
+    metadata = MappingProxyType({attr: MappingProxyType({'unit': unit, 'value': value})
+                                 for attr, unit, value in zip(attributes, units, values)})
+
+    def value(attr, default=0):
+        return metadata[attr]['value'] if attr in metadata else default
+
+    return SourceSpec(
+        name=name,
+        generic_name=value('generic_name', None),
+        type=value('type', None),
+        finance=value('finance', None),
+        is_bess=value('type', None) == 'BESS',
+        block_load_acceptance=value('block_load_acceptance'),
+        num_annual_fails=int(value('num_annual_fails')),
+        downtime_per_fail=int(value('downtime_per_fail')),
+        solar_sudden_drops=int(value('solar_sudden_drops')),
+        annual_degradation=value('annual_degradation', None),
+        capital_cost_baseline=value('capital_cost_baseline'),
+        useful_life=value('useful_life'),
+        inflation_rate=value('inflation_rate'),
+        min_annual_off_take=value('min_annual_off_take'),
+        fuel_consumption=value('fuel_consumption'),
+        fuel_cost=value('fuel_cost'),
+        tariff_baseline_fixed=value('tariff_baseline_fixed'),
+        tariff_baseline_var=value('tariff_baseline_var'),
+        opex_baseline_fixed=value('opex_baseline_fixed'),
+        opex_baseline_var=value('opex_baseline_var'),
+        metadata=metadata,
+    )
+
 
 class Source:
-    def __init__(self, name, attributes, units, values):
-        self.name = name
-        self.attributes = attributes
-        self.units = units
-        self.values = values
-        self.metadata = {attr: {'unit': unit, 'value': value} for attr, unit, value in zip(attributes, units, values)}
+    def __init__(self, spec):
+        # spec is shared with all other units of the same type, only config and ops_data belong to this unit
+        self.spec = spec
+        self.name = spec.name
         self.config = {}
         self.ops_data = {}
+        self.configured_columns = None
         # Status 0 is off, 1 is on, -2 is downtime, -1 is failure, -3 doesn't exist
         # for BESS Status 0 is trickel charge, 1 is discharging, 2 is charging, -1 is downtime, -2 is failure, -3 doesn't exist
         
-    def configure(self, start_year, end_year, rating, rating_unit, spin_reserve, priority, min_loading, max_loading):
+    def configure(self, start_year, end_year, rating, rating_unit, spin_reserve, priority, min_loading, max_loading, seed=None, pool=None,
+                  keep_configured=False):
         # Update the config dictionary with new key-value pairs
         self.config['start_year'] = start_year
         self.config['end_year'] = end_year
@@ -24,137 +73,90 @@ class Source:
         self.config['min_loading'] = min_loading
         self.config['max_loading'] = max_loading
         self.config['spinning_reserve'] = spin_reserve
-        # Example calculation for 'capex', assumes 'capital_cost_baseline' is in metadata and 'inflation_rate' is available
-        self.config['capex'] = rating * self.metadata.get('capital_cost_baseline', {'value': 0})['value'] * (1 + Project.inflation_rate)**(start_year-1)
-        self.ops_data = self._initialize_years()
+        # Failures and sudden drops are drawn from this generator, pass a seed for repeatable runs.
+        self.config['seed'] = seed
+        self.rng = np.random.default_rng(seed)
+        self.config['capex'] = rating * self.spec.capital_cost_baseline * (1 + Project.inflation_rate)**(start_year-1)
+        # a StatePool hands out a reused store instead of allocating new buffers
+        self.ops_data = OpsStore(start_year, end_year) if pool is None else pool.acquire_ops(start_year, end_year)
         self.update_power_capacity()
         self.initialize_bess()
+        # The deterministic columns, for reseed to put back instead of computing them again
+        self.configured_columns = {field: self.ops_data.hour_fields[field].copy() for field in ('capacity', 'reserve')} \
+            if keep_configured else None
         self.seed_failures()
         self.seed_solar_reductions()
         self.aggregate_failure_reduction_stats()
     
+    def reseed(self, seed=None):
+        # Redraw failures and sudden drops for the same configuration, e.g. for another Monte Carlo
+        # replication. Leaves the source exactly as configure would with this seed. The capacity
+        # and BESS reserve columns are copied back when configure kept them (keep_configured).
+        self.config['seed'] = seed
+        self.rng = np.random.default_rng(seed)
+        self.ops_data.reset()
+        if self.configured_columns is None:
+            self.update_power_capacity()
+            self.initialize_bess()
+        else:
+            for field, values in self.configured_columns.items():
+                self.ops_data.hour_fields[field][:] = values
+        self.seed_failures()
+        self.seed_solar_reductions()
+        self.aggregate_failure_reduction_stats()
+
+    @property
+    def metadata(self):
+        return self.spec.metadata
+
     def display_info(self):
         for attr, info in self.data.items():
             print(f"{attr} ({info['unit']}): {info['value']}")
 
-    def _initialize_years(self):
-        years_data = {}
-        for year in range(1, 13):
-            if year >= self.config['start_year'] and year <= self.config['end_year']:
-                exists = True
-            else:
-                exists = False
-            year_dict = {
-                'source_present': 1 if exists else 0,
-                'year_failures': 0,
-                'year_reductions' : 0,
-                'year_downtime': 0,
-                'year_energy_output': 0,
-                'year_cost_of_operation': 0,
-                'year_fuel_cost': 0,
-                'year_fixed_opex': 0,
-                'year_var_opex': 0,
-                'year_depreciation': 0,
-                'year_ppa_cost': 0,
-                'year_operation_hours': 0,
-                'year_unit_cost' : 0,
-                'months': {}
-            }
-            year_dict['months'] = self._initialize_months(year, exists)
-            years_data[year] = year_dict
-        return years_data
-
-    def _initialize_months(self, year, exists):
-        months_data = {}
-        for month in range(1, 13):
-            days_in_month = 28 if month == 2 else 30 if month in [4, 6, 9, 11] else 31
-            month_dict = {
-                'month_failures': 0,
-                'month_reductions' : 0,
-                'month_downtime': 0,
-                'month_energy_output': 0,
-                'month_operation_hours': 0,
-                'days': {}
-            }
-            month_dict['days'] = self._initialize_days(year, month, exists, days_in_month)
-            months_data[month] = month_dict
-        return months_data
-
-    def _initialize_days(self, year, month, exists, days_in_month):
-        days_data = {}
-        for day in range(1, days_in_month + 1):
-            day_dict = {
-                'avg_power_output': 0,
-                'min_power_output': 0,
-                'max_power_output': 0,
-                'day_energy_output': 0,
-                'failure_events': 0,
-                'reduction_events' : 0,
-                'operation_hours': 0,
-                'downtime': 0,
-                'hours': self._initialize_hours(exists)
-            }
-            days_data[day] = day_dict
-        return days_data
-
-    def _initialize_hours(self, exists):
-        hours_data = {}
-        status = 0 if exists else -3
-        for hour in range(24):
-            hours_data[hour] = {
-                'capacity': 0,
-                'power_output': 0,
-                'energy_output': 0,
-                'reserve' : 0,
-                'status': status,
-                'mandatory_reserve' : 0
-            }
-        return hours_data
-
     def seed_solar_reductions(self):
         # Ensure this function only applies to renewable sources
-        if self.metadata['type']['value'] != 'R':
+        if self.spec.type != 'R':
             return
         
-        daily_hours_to_flag = self.metadata.get('solar_sudden_drops', {'value': 0})['value']
+        daily_hours_to_flag = self.spec.solar_sudden_drops
 
         if daily_hours_to_flag <= 0:
             return  # Skip if no disturbances are to be seeded
 
-        for year, year_data in self.ops_data.items():
-            if year_data.get('source_present') == 0:
-                continue  # Skip non-existent years for this source
-            
-            for month, month_data in year_data['months'].items():
-                for day, day_data in month_data['days'].items():
-                    
-                    candidate_hours = []  # hours eligible for being flagged
-                    
-                    for hour in range(1,24):
-                        
-                        # Check for a negative power output delta between h and h-1
-                        if hour > 0 and day_data['hours'][hour]['capacity'] < day_data['hours'][hour - 1]['capacity']:
-                            candidate_hours.append(hour)
-                    
-                    # Randomly select hours to flag, up to the daily limit
-                    hours_to_flag = random.sample(candidate_hours, min(len(candidate_hours), daily_hours_to_flag))
-                    
-                    for hour in hours_to_flag:
-                        day_data['hours'][hour]['status'] = 0.5  # Flag as sudden power reduction 
+        capacity = self.ops_data.capacity.reshape(NUM_DAYS, HOURS_PER_DAY)
+        status = self.ops_data.status.reshape(NUM_DAYS, HOURS_PER_DAY)
+        present_days = np.repeat(self.ops_data.present, DAYS_PER_YEAR)
+
+        # Hours 1..23 are eligible when capacity drops from the previous hour (columns are hour - 1)
+        candidates = (capacity[:, 1:] < capacity[:, :-1]) & present_days[:, None]
+
+        # Give every eligible hour a random key; the lowest keys of each day are a uniform
+        # sample without replacement, up to the daily limit.
+        keys = self.rng.random(candidates.shape)
+        keys[~candidates] = np.inf
+        picked = np.argsort(keys, axis=1)[:, :min(daily_hours_to_flag, HOURS_PER_DAY - 1)]
+        days, cols = np.nonzero(np.take_along_axis(candidates, picked, axis=1))
+
+        status[days, picked[days, cols] + 1] = 0.5  # Flag as sudden power reduction
     
     def seed_failures(self):
 
-        annual_fails = self.metadata['num_annual_fails']['value']
+        annual_fails = self.spec.num_annual_fails
         if annual_fails <= 0:
             return
 
-        for year, year_data in self.ops_data.items():
+        downtime = self.spec.downtime_per_fail
+        status = self.ops_data.status.reshape(NUM_YEARS, HOURS_PER_YEAR)
+        # Failures can start in any hour of the year except midnight
+        start_hours = np.flatnonzero(np.arange(HOURS_PER_YEAR) % HOURS_PER_DAY != 0)
 
-            if year_data.get('source_present') == 0:
+        for year in range(1, NUM_YEARS + 1):
+
+            if not self.ops_data.present[year - 1]:
                 continue  # Skip non-existent years for this source
 
             # Introduce variability in failure occurrence
-            fail_chance = random.random()  # Get a random float number between 0.0 to 1.0
+            fail_chance = self.rng.random()  # Get a random float number between 0.0 to 1.0
             if annual_fails == 1:
                 if fail_chance <= 1/3:
                     this_year_fails = 1
@@ -168,108 +170,86 @@ class Source:
                 else:
                     this_year_fails = 0  # No failure
 
-            days_of_year = []
-            # Generate a flat list of all day-hour combinations
-            for month, month_data in year_data['months'].items():
-                for day, day_data in month_data['days'].items():
-                    for hour in range(1,24):
-                        days_of_year.append((month, day, hour))
-            
-            # Randomly select days for failures, ensuring unique days
-            failure_days = random.sample(days_of_year, this_year_fails)
-
-            for month, day, fail_hour in failure_days:
-                # Mark the failure hour
-                year_data['months'][month]['days'][day]['hours'][fail_hour]['status'] = -1
-                
-                # Apply downtime for subsequent hours
-                downtime = self.metadata['downtime_per_fail']['value'] - 1
-                while downtime > 0:
-                    fail_hour += 1
-                    if fail_hour >= 24:
-                        fail_hour = 0
-                        day += 1
-                        # Move to the next month if the days exceed the month's length
-                        if day > len(year_data['months'][month]['days']):
-                            day = 1
-                            month += 1
-                            # Reset to January if the month exceeds the year
-                            if month > 12:
-                                month = 1
-                    year_data['months'][month]['days'][day]['hours'][fail_hour]['status'] = -2
-                    downtime -= 1
+            year_status = status[year - 1]
+            for fail_hour in self.rng.choice(start_hours, this_year_fails, replace=False):
+                # Mark the failure hour, then downtime for the following hours.
+                # Downtime running past the end of the year wraps to January of the same year.
+                year_status[fail_hour] = -1
+                downtime_end = fail_hour + downtime
+                year_status[fail_hour + 1:min(downtime_end, HOURS_PER_YEAR)] = -2
+                if downtime_end > HOURS_PER_YEAR:
+                    year_status[:downtime_end - HOURS_PER_YEAR] = -2
 
     def aggregate_failure_reduction_stats(self):
-        # Iterate through all levels of data to update day, month, and year aggregates
+        # Count failure, downtime and reduction hours per day straight from the status array,
+        # then roll the day counts up to month and year level.
+        status = self.ops_data.status.reshape(NUM_DAYS, HOURS_PER_DAY)
+        failures = (status == -1).sum(axis=1)
+        downtime = (status == -2).sum(axis=1) + failures
+        reductions = (status == 0.5).sum(axis=1)
+
+        day_fields = self.ops_data.day_fields
+        day_fields['failure_events'][:] = failures
+        day_fields['downtime'][:] = downtime
+        day_fields['reduction_events'][:] = reductions
+
+        month_failures = sum_days_by_month(failures)
+        month_downtime = sum_days_by_month(downtime)
+        month_reductions = sum_days_by_month(reductions)
+
         for year, year_data in self.ops_data.items():
 
             if year_data.get('source_present') == 0:
                 continue  # Skip non-existent years for this source
 
             for month, month_data in year_data['months'].items():
-                for day, day_data in month_data['days'].items():
-                    # Count the failure occurrences and downtime at the day level
-                    failure_occurrence = sum(1 for hour in day_data['hours'].values() if hour['status'] == -1)
-                    downtime = sum(1 for hour in day_data['hours'].values() if hour['status'] == -2) + failure_occurrence
-                    reductions = sum(1 for hour in day_data['hours'].values() if hour['status'] == 0.5)
-                    # Update day level data
-                    day_data['failure_events'] = failure_occurrence
-                    day_data['downtime'] = downtime
-                    day_data['reduction_events'] = reductions
-                    
-                    # Accumulate counts for the month level data
-                    month_data['month_failures'] += failure_occurrence
-                    month_data['month_downtime'] += downtime
-                    month_data['month_reductions'] += reductions
-                
-                # Accumulate counts for the year level data
-                year_data['year_failures'] += month_data['month_failures']
-                year_data['year_downtime'] += month_data['month_downtime']
-                year_data['year_reductions'] += month_data['month_reductions']    
+                month_data['month_failures'] = int(month_failures[year - 1, month - 1])
+                month_data['month_downtime'] = int(month_downtime[year - 1, month - 1])
+                month_data['month_reductions'] = int(month_reductions[year - 1, month - 1])
+
+            year_data['year_failures'] = int(month_failures[year - 1].sum())
+            year_data['year_downtime'] = int(month_downtime[year - 1].sum())
+            year_data['year_reductions'] = int(month_reductions[year - 1].sum())
 
     def update_power_capacity(self):
-        for year, year_data in self.ops_data.items():
+        # Capacity is either a constant per year (optionally degraded) or a scaled copy of the
+        # solar profile, so the whole series is filled with array assignments per year.
+        src_type = self.spec.type
+        finance = self.spec.finance
+        rating = self.config['rating']
+        max_loading = self.config['max_loading']
+
+        present = self.ops_data.present
+        capacity = self.ops_data.capacity.reshape(NUM_YEARS, HOURS_PER_YEAR)
+
+        if src_type == 'R':
+            # Use solar profile for renewable sources
+            capacity[present] = Project.solar_profile_array() / 5 * rating * max_loading / 100
+            return
 
-            if year_data.get('source_present') == 0:
-                continue  # Skip non-existent years for this source
-            
-            years_of_operation = year - self.config['start_year'] 
+        yearly_capacity = np.zeros(NUM_YEARS)
+        if src_type == 'NR' and finance == 'PPA':
+            yearly_capacity[:] = rating * max_loading/100
 
-            for month, month_data in year_data['months'].items():
-                for day, day_data in month_data['days'].items():
-                    for hour, hour_data in day_data['hours'].items():
-                        power_capacity = 0
-
-                        if self.metadata['type']['value'] == 'NR' and self.metadata['finance']['value'] == 'PPA':
-                            power_capacity = self.config['rating'] * self.config['max_loading']/100
-
-                        elif self.metadata['type']['value'] == 'NR' and self.metadata['finance']['value'] == 'CAPTIVE':
-                            # Check for 'annual_degradation' key in metadata
-                            if 'annual_degradation' in self.metadata:
-                                annual_degradation_rate = self.metadata['annual_degradation']['value']
-                                # Apply annual degradation
-                                degraded_rating = self.config['rating'] * ((1 - (annual_degradation_rate/100)) ** years_of_operation)
-                                power_capacity = degraded_rating * self.config['max_loading']/100
-
-                        elif self.metadata['type']['value'] == 'R':
-                            # Use solar profile for renewable sources
-                            # Assuming the Project class and solar_profile structure allows this direct access
-                            solar_output = Project.solar_profile[month][day][hour]
-                            power_capacity = (solar_output / 5) * self.config['rating'] * self.config['max_loading']/100
-                        
-                        elif self.metadata['type']['value'] == 'BESS' and self.metadata['finance']['value'] == 'PPA':
-                            
-                            power_capacity = self.config['rating'] * self.config['max_loading']/100
-
-                        # Update power_capacity for the hour
-                        hour_data['capacity'] = power_capacity
-    
-    
-    def initialize_bess(self):
+        elif src_type == 'NR' and finance == 'CAPTIVE':
+            if self.spec.annual_degradation is not None:
+                annual_degradation_rate = self.spec.annual_degradation
+                start_year = self.config['start_year']
+                # Apply annual degradation, with Python float powers per year so the values match
+                # the year by year calculation exactly (numpy's power can differ in the last digit)
+                yearly_capacity[:] = [rating * ((1 - (annual_degradation_rate/100)) ** (year - start_year)) * max_loading/100
+                                      if present[year - 1] else 0 for year in range(1, NUM_YEARS + 1)]
+
+        elif src_type == 'BESS' and finance == 'PPA':
+            yearly_capacity[:] = rating * max_loading/100
 
-        if self.metadata['type']['value'] == 'BESS':
-            #capacity is set through the set capacity function.
-            self.ops_data[1]['months'][1]['days'][1]['hours'][0]['reserve'] = self.config['rating'] * self.config['max_loading']/100
+        capacity[present] = yearly_capacity[present, None]
+
+    def initialize_bess(self, i=0):
+
+        if self.spec.is_bess:
+            #capacity is set through the set capacity function. Full reserve at hour i, the run starts at hour 0
+            self.ops_data.reserve[i] = self.config['rating'] * self.config['max_loading']/100
     
     """
     def adjusted_capacity(self,y,m,d,h):
@@ -279,110 +259,138 @@ class Source:
         return src_capacity * max_loading_percentage/100
     """
 
-    def aggregate_day_stats(self):
-
-        for year in self.ops_data:
-            for month in self.ops_data[year]['months']:
-                for day in self.ops_data[year]['months'][month]['days']:
-                    hours = self.ops_data[year]['months'][month]['days'][day]['hours'].values()
-
-                    # Directly calculate metrics without intermediate steps
-                    self.ops_data[year]['months'][month]['days'][day].update({
-                        'avg_power_output': sum(hour['power_output'] for hour in hours) / 24,
-                        'min_power_output': min(hour['power_output'] for hour in hours),
-                        'max_power_output': max(hour['power_output'] for hour in hours),
-                        'day_energy_output': sum(hour['energy_output'] for hour in hours),
-                        'failure_events': sum(hour['status'] == -1 for hour in hours),
-                        'reduction_events': sum(hour['status'] == 0.5 for hour in hours),
-                        'operation_hours': sum(hour['status'] == 1 for hour in hours),
-                        'downtime': sum(hour['status'] == -2 for hour in hours),
-                    })
-
-    def aggregate_month_stats(self):
-
-        for year in self.ops_data:
-            for month in self.ops_data[year]['months']:
-                month_data = self.ops_data[year]['months'][month]['days']
-
-                self.ops_data[year]['months'][month].update({
-                    'month_failures': sum(day['failure_events'] for day in month_data.values()),
-                    'month_reductions': sum(day['reduction_events'] for day in month_data.values()),
-                    'month_downtime': sum(day['downtime'] for day in month_data.values()),
-                    'month_energy_output': sum(day['day_energy_output'] for day in month_data.values()),
-                    'month_operation_hours': sum(day['operation_hours'] for day in month_data.values()),
+    def aggregate_stats(self, day_weights=None):
+        """
+        Day, month and year statistics of the simulated hours in one vectorised reduction:
+        the hourly arrays are summed into days, days into months and months into years.
+        day_weights (one per day of the run) scales each day in the month and year totals,
+        for runs on representative days; the day records keep the simulated values.
+        """
+        power_output = self.ops_data.power_output.reshape(NUM_DAYS, HOURS_PER_DAY)
+        energy_output = self.ops_data.energy_output.reshape(NUM_DAYS, HOURS_PER_DAY)
+        status = self.ops_data.status.reshape(NUM_DAYS, HOURS_PER_DAY)
+
+        day_fields = self.ops_data.day_fields
+        day_fields['avg_power_output'][:] = power_output.sum(axis=1) / 24
+        day_fields['min_power_output'][:] = power_output.min(axis=1)
+        day_fields['max_power_output'][:] = power_output.max(axis=1)
+        day_fields['day_energy_output'][:] = energy_output.sum(axis=1)
+        day_fields['failure_events'][:] = (status == -1).sum(axis=1)
+        day_fields['reduction_events'][:] = (status == 0.5).sum(axis=1)
+        day_fields['operation_hours'][:] = (status == 1).sum(axis=1)
+        day_fields['downtime'][:] = (status == -2).sum(axis=1)
+
+        def month_totals(field):
+            return sum_days_by_month(day_fields[field] if day_weights is None else day_fields[field] * day_weights)
+
+        month_failures = month_totals('failure_events')
+        month_reductions = month_totals('reduction_events')
+        month_downtime = month_totals('downtime')
+        month_energy_output = month_totals('day_energy_output')
+        month_operation_hours = month_totals('operation_hours')
+
+        for year, year_data in self.ops_data.items():
+            y = year - 1
+
+            for month, month_data in year_data['months'].items():
+                m = month - 1
+                month_data.update({
+                    'month_failures': int(month_failures[y, m]),
+                    'month_reductions': int(month_reductions[y, m]),
+                    'month_downtime': int(month_downtime[y, m]),
+                    'month_energy_output': float(month_energy_output[y, m]),
+                    'month_operation_hours': int(month_operation_hours[y, m]),
                 })
 
-    def aggregate_year_stats(self):
-
-        for year in self.ops_data:
-            year_data = self.ops_data[year]['months']
-
-            total_energy_output = sum(month_data['month_energy_output'] for month_data in year_data.values())
-            finance_type = self.metadata['finance']['value']
-            inflation_rate = self.metadata.get('inflation_rate', {'value': 0})['value']
-            if self.ops_data[year]['source_present'] == 1:
-                min_offtake = self.config['rating'] * self.metadata.get('min_annual_off_take', {'value': 0})['value']
-            else: min_offtake = 0
-            # Calculate costs with base values
-            fuel_cost_base = 0
-            if finance_type == "CAPTIVE":
-                fuel_cost_base = total_energy_output * self.metadata['fuel_consumption']['value'] * self.metadata['fuel_cost']['value']
-            elif finance_type == "PPA":
-                fuel_cost_base = total_energy_output * self.metadata['fuel_cost']['value']
-
-            variable_component = 0
-            fixed_component = 0
-            ppa_cost_base = 0
-            if finance_type == "PPA":
-                if self.ops_data[year]['source_present'] == 1:
-                    fixed_component = self.config['rating'] * self.metadata['tariff_baseline_fixed']['value']
-                    variable_component = max(min_offtake, total_energy_output) * self.metadata['tariff_baseline_var']['value']
-                    ppa_cost_base = fixed_component + variable_component
-            
-            fixed_opex_base = 0
-            var_opex_base = 0
-            if finance_type == "CAPTIVE":
-                if self.ops_data[year]['source_present'] == 1:
-                    fixed_opex_base = self.config['rating'] * self.metadata['opex_baseline_fixed']['value']
-                    var_opex_base = total_energy_output * self.metadata['opex_baseline_var']['value']
-
-
-            # Apply inflation to calculated costs except depreciation
-            fuel_cost = fuel_cost_base * (1 + inflation_rate)**(year-1)
-            ppa_cost = ppa_cost_base * (1 + inflation_rate)**(year-1)
-            fixed_opex = fixed_opex_base * (1 + inflation_rate)**(year-1)
-            var_opex = var_opex_base * (1 + inflation_rate)**(year-1)
-
-            # Depreciation is calculated separately for CAPTIVE sources, not affected by inflation
-            depreciation = 0
-            if finance_type == "CAPTIVE":
-                if self.ops_data[year]['source_present'] == 1:
-                    depreciation = self.config['rating'] * self.metadata['capital_cost_baseline']['value'] / self.metadata['useful_life']['value']
-
-            # Sum of all costs for the year
-            year_cost_of_operation = fuel_cost + fixed_opex + var_opex + ppa_cost + depreciation
-            year_unit_cost = year_cost_of_operation / (total_energy_output * 1000) if total_energy_output > 0 else 0
-
-            self.ops_data[year].update({
-                'year_failures': sum(month_data['month_failures'] for month_data in year_data.values()),
-                'year_reductions': sum(month_data['month_reductions'] for month_data in year_data.values()),
-                'year_downtime': sum(month_data['month_downtime'] for month_data in year_data.values()),
+            total_energy_output = float(month_energy_output[y].sum())
+            year_data.update({
+                'year_failures': int(month_failures[y].sum()),
+                'year_reductions': int(month_reductions[y].sum()),
+                'year_downtime': int(month_downtime[y].sum()),
                 'year_energy_output': total_energy_output,
-                'year_cost_of_operation': round(year_cost_of_operation/1000000,2),
-                'year_fuel_cost': round(fuel_cost,2),
-                'year_fixed_opex': round(fixed_opex,2),
-                'year_var_opex': round(var_opex,2),
-                'year_depreciation': round(depreciation  / 1000000,2),
-                'year_ppa_cost': round(ppa_cost / 1000000,2),
-                'year_operation_hours': sum(month_data['month_operation_hours'] for month_data in year_data.values()),
-                'year_unit_cost': round(year_unit_cost,2),
+                'year_operation_hours': int(month_operation_hours[y].sum()),
             })
+            year_data.update(self.year_costs(year, total_energy_output))
+
+    def aggregate_year_costs(self, day_weights=None):
+        # Yearly energy output and costs only, enough for the scenario KPIs. Energy is reduced through
+        # days and months exactly like aggregate_stats so both give the same totals.
+        day_energy_output = self.ops_data.energy_output.reshape(NUM_DAYS, HOURS_PER_DAY).sum(axis=1)
+        if day_weights is not None:
+            day_energy_output = day_energy_output * day_weights
+        month_energy_output = sum_days_by_month(day_energy_output)
+
+        for year, year_data in self.ops_data.items():
+            total_energy_output = float(month_energy_output[year - 1].sum())
+            year_data['year_energy_output'] = total_energy_output
+            year_data.update(self.year_costs(year, total_energy_output))
+
+    def year_costs(self, year, total_energy_output):
+
+        spec = self.spec
+        finance_type = spec.finance
+        inflation_rate = spec.inflation_rate
+        source_present = self.ops_data[year]['source_present'] == 1
+        if source_present:
+            min_offtake = self.config['rating'] * spec.min_annual_off_take
+        else: min_offtake = 0
+        # Calculate costs with base values
+        fuel_cost_base = 0
+        if finance_type == "CAPTIVE":
+            fuel_cost_base = total_energy_output * spec.fuel_consumption * spec.fuel_cost
+        elif finance_type == "PPA":
+            fuel_cost_base = total_energy_output * spec.fuel_cost
+
+        variable_component = 0
+        fixed_component = 0
+        ppa_cost_base = 0
+        if finance_type == "PPA":
+            if source_present:
+                fixed_component = self.config['rating'] * spec.tariff_baseline_fixed
+                variable_component = max(min_offtake, total_energy_output) * spec.tariff_baseline_var
+                ppa_cost_base = fixed_component + variable_component
+
+        fixed_opex_base = 0
+        var_opex_base = 0
+        if finance_type == "CAPTIVE":
+            if source_present:
+                fixed_opex_base = self.config['rating'] * spec.opex_baseline_fixed
+                var_opex_base = total_energy_output * spec.opex_baseline_var
+
+        # Apply inflation to calculated costs except depreciation
+        fuel_cost = fuel_cost_base * (1 + inflation_rate)**(year-1)
+        ppa_cost = ppa_cost_base * (1 + inflation_rate)**(year-1)
+        fixed_opex = fixed_opex_base * (1 + inflation_rate)**(year-1)
+        var_opex = var_opex_base * (1 + inflation_rate)**(year-1)
+
+        # Depreciation is calculated separately for CAPTIVE sources, not affected by inflation
+        depreciation = 0
+        if finance_type == "CAPTIVE":
+            if source_present:
+                depreciation = self.config['rating'] * spec.capital_cost_baseline / spec.useful_life
+
+        # Sum of all costs for the year
+        year_cost_of_operation = fuel_cost + fixed_opex + var_opex + ppa_cost + depreciation
+        year_unit_cost = year_cost_of_operation / (total_energy_output * 1000) if total_energy_output > 0 else 0
+
+        return {
+            'year_cost_of_operation': round(year_cost_of_operation/1000000,2),
+            'year_fuel_cost': round(fuel_cost,2),
+            'year_fixed_opex': round(fixed_opex,2),
+            'year_var_opex': round(var_opex,2),
+            'year_depreciation': round(depreciation  / 1000000,2),
+            'year_ppa_cost': round(ppa_cost / 1000000,2),
+            'year_unit_cost': round(year_unit_cost,2),
+        }
 
 
 class SourceManager:
-    def __init__(self, file_path):
+    def __init__(self, file_path=None):
+        # Without a file_path the manager starts empty and source_types is filled by the caller, e.g. synthetic_data
         self.file_path = file_path
         self.source_types = {}
+        if file_path is None:
+            return
         try:
             self.read_sources()
         except Exception as e:
@@ -405,22 +413,20 @@ class SourceManager:
         # Source names are in columns D to H for the first 5 sources
         source_columns = list(df.columns[3:8])  # Adjust if there are more sources
 
-        # Initialize Source objects for SRC_1 to SRC_5
+        # Parse the specs of SRC_1 to SRC_5
         for source_column in source_columns:
             values = df[source_column].tolist()
-            self.source_types[source_column] = Source(source_column, attributes, units, values)
+            self.source_types[source_column] = parse_source_spec(source_column, attributes, units, values)
 
         # Column L (index 11) for SRC_6, using the second set of attributes and units
         values_captive = df[df.columns[11]].tolist()
-        self.source_types[df.columns[11]] = Source(df.columns[11], attributes_captive, units_captive, values_captive)
+        self.source_types[df.columns[11]] = parse_source_spec(df.columns[11], attributes_captive, units_captive, values_captive)
 
     def get_source_types_by_name(self, name):
 
         if name in self.source_types:
-            # Get the template source object
-            template_src = self.source_types[name]
-            new_src = Source(template_src.name, template_src.attributes, template_src.units, template_src.values)
-            return new_src
+            # New unit sharing the parsed spec of its type
+            return Source(self.source_types[name])
         else:
             return None
     
@@ -0,0 +1,134 @@
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from evaluation import build_sources, canonical_genome, load_prereq_data
+from scenario import Scenario
+
+# Command line run: the baseline settings of simulator.py, and the grid swept around them (8 settings).
+# spin_reserve_perc is left out, build_sources configures every unit with spin_reserve=0 so it has no effect.
+SCENARIO_PARAMS = dict(
+    name="Sweep",
+    client_name="Engro",
+    spin_reserve_perc=0,
+    bess_non_emergency_use=2,
+    bess_charge_hours=1,
+    bess_priority_wise_use=True,
+    charge_ratio_night=2.5,
+)
+SWEEP_GRID = dict(
+    bess_non_emergency_use=[1, 2],
+    bess_priority_wise_use=[True, False],
+    charge_ratio_night=[2.5, 30],
+)
+OUTPUT_FILE = 'data/sweep_results.csv'
+
+# The source mix configured in this process as (key, sources in build order, their saved ops data),
+# shared by every setting run here for the same mix and seed.
+configured_mix = None
+
+
+def parameter_grid(**values):
+    # Every combination of the given values, parameter_grid(charge_ratio_night=[2.5, 30], bess_charge_hours=[1, 2]) gives 4 settings
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*values.values())]
+
+
+def configured_sources(individual, seed):
+    """
+    Sources of the mix as Source.configure leaves them. Configuring happens once per process,
+    the configured state is saved and later calls put it back in place (OpsStore.restore)
+    instead of drawing failures and capacities again.
+    """
+    global configured_mix
+    key = (canonical_genome(individual), seed)
+    if configured_mix is None or configured_mix[0] != key:
+        src_list = build_sources(individual, seed)
+        configured_mix = (key, src_list, [src.ops_data.snapshot() for src in src_list])
+    else:
+        for src, snapshot in zip(configured_mix[1], configured_mix[2]):
+            src.ops_data.restore(snapshot)
+    # Scenario sorts the list it gets, the saved build order must stay as it is
+    return list(configured_mix[1])
+
+
+def run_setting(individual, setting, scenario_params, seed, years=None):
+    # scenario_kpis of the mix under one setting, which overrides the fixed scenario_params
+    sc = Scenario(selected_sources=configured_sources(individual, seed), **{'kpi_only': True, **scenario_params, **setting})
+    sc.simulate(years)
+    return sc.scenario_kpis
+
+
+def sweep_table(settings, kpi_results):
+    # One row per setting, the swept parameters first and the KPIs after them
+    return pd.DataFrame([{**setting, **kpis} for setting, kpis in zip(settings, kpi_results)])
+
+
+class SweepRunner:
+    """
+    Runs one source mix (a chromosome) under many Scenario settings and collects the KPIs.
+
+    The mix is configured once per process and every setting starts from that same state, so
+    all settings see the same failures and sudden drops and only the dispatch differs. seed None
+    picks one seed for the whole sweep. With workers > 1 the settings are spread over a process
+    pool whose workers load the Project and SourceManager data once at start up, workers <= 1
+    runs everything in this process. data_folder None runs serially on the data already loaded
+    here. Use as a context manager, or call close(), to shut the pool down.
+    """
+
+    def __init__(self, individual, scenario_params, data_folder='data', workers=None, seed=None, years=None):
+        self.individual = individual
+        self.scenario_params = scenario_params
+        self.workers = os.cpu_count() if workers is None else workers
+        self.seed = int(np.random.SeedSequence().entropy) if seed is None else seed
+        self.years = years
+        self.executor = None
+
+        if data_folder is None:
+            self.workers = 1
+        elif self.workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=load_prereq_data, initargs=(data_folder,))
+        else:
+            load_prereq_data(data_folder)
+
+    def run(self, settings):
+        # KPI table of the settings, dicts of Scenario keywords (bess_non_emergency_use, bess_charge_hours,
+        # bess_priority_wise_use, charge_ratio_night, ...), in the order given
+        settings = list(settings)
+        n = len(settings)
+        if self.executor is None:
+            kpi_results = [run_setting(self.individual, setting, self.scenario_params, self.seed, self.years)
+                           for setting in settings]
+        else:
+            # Small chunks keep all workers busy, the pool returns results in submission order.
+            chunksize = max(1, n // (4 * self.workers))
+            kpi_results = list(self.executor.map(run_setting, [self.individual] * n, settings, [self.scenario_params] * n,
+                                                 [self.seed] * n, [self.years] * n, chunksize=chunksize))
+        return sweep_table(settings, kpi_results)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == "__main__":
+    # python sweep.py <chromosome as comma separated genes> [seed]
+    individual = sys.argv[1].split(',')
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    settings = parameter_grid(**SWEEP_GRID)
+    print(f'Sweeping {len(settings)} settings')
+    with SweepRunner(individual, SCENARIO_PARAMS, seed=seed) as runner:
+        table = runner.run(settings)
+    os.makedirs(os.path.dirname(OUTPUT_FILE) or '.', exist_ok=True)
+    table.to_csv(OUTPUT_FILE, index=False)
+    print(f'Sweep results written to {OUTPUT_FILE}')
+    print(table.to_string())
@@ -0,0 +1,135 @@
+import numpy as np
+import evaluation
+from evaluation import GENE_BEGIN, GENOME_LENGTH
+from project import Project
+from sources2 import SourceManager, parse_source_spec
+from time_axis import NUM_YEARS, DAYS_IN_MONTH, HOURS_PER_DAY
+
+# Synthetic stand ins for the input workbooks, for benchmarking and trying the engine without the
+# real data. The source types are the same kinds as on the 'src' sheet, with similar cost levels.
+SYNTHETIC_SOURCE_TYPES = {
+    'SRC_1': {'generic_name': 'Synthetic solar PPA', 'stability': 'UNSTABLE', 'type': 'R', 'finance': 'PPA',
+              'min_annual_off_take': 1000, 'tariff_baseline_var': 68.97,
+              'num_annual_fails': 2, 'downtime_per_fail': 4, 'solar_sudden_drops': 2, 'block_load_acceptance': 0},
+    'SRC_2': {'generic_name': 'Synthetic HFO PPA', 'stability': 'STABLE', 'type': 'NR', 'finance': 'PPA',
+              'min_annual_off_take': 2500, 'tariff_baseline_var': 189.66,
+              'num_annual_fails': 1, 'downtime_per_fail': 4, 'block_load_acceptance': 25},
+    'SRC_3': {'generic_name': 'Synthetic BESS PPA', 'stability': 'UNSTABLE', 'type': 'BESS', 'finance': 'PPA',
+              'tariff_baseline_fixed': 68965.52,
+              'num_annual_fails': 1, 'downtime_per_fail': 4, 'block_load_acceptance': 100},
+    'SRC_4': {'generic_name': 'Synthetic existing solar PPA', 'stability': 'UNSTABLE', 'type': 'R', 'finance': 'PPA',
+              'min_annual_off_take': 1000, 'tariff_baseline_var': 37.93,
+              'num_annual_fails': 2, 'downtime_per_fail': 4, 'solar_sudden_drops': 2, 'block_load_acceptance': 0},
+    'SRC_5': {'generic_name': 'Synthetic solar and BESS PPA', 'stability': 'STABLE', 'type': 'NR', 'finance': 'PPA',
+              'min_annual_off_take': 1000, 'tariff_baseline_var': 130,
+              'num_annual_fails': 1, 'downtime_per_fail': 4, 'block_load_acceptance': 100},
+    'SRC_6': {'generic_name': 'Synthetic captive DG sets', 'stability': 'STABLE', 'type': 'NR', 'finance': 'CAPTIVE',
+              'fuel_consumption': 268, 'fuel_cost': 1, 'opex_baseline_fixed': 6206.9, 'opex_baseline_var': 5.17,
+              'useful_life': 10, 'annual_degradation': 1,
+              'num_annual_fails': 2, 'downtime_per_fail': 4, 'block_load_acceptance': 40},
+}
+
+# Dispatch priority of every source block, as simulator.py assigns them
+SYNTHETIC_PRIORITIES = {'SRC_1': 2, 'SRC_2': 3, 'SRC_3': 4, 'SRC_4': 1, 'SRC_5': 5, 'SRC_6': 6}
+
+
+def make_project(total_load=7.0, critical_share=4/7, load_growth=0.03, solar_peak=3.0, seed=0):
+    """
+    Fill the Project class data in place of read_load_projection and read_load_solar_data_from_folder:
+    a 12 year load projection growing by load_growth a year, and 365 daily load and solar profiles
+    (MW) with a seasonal swing, random day to day variation and cloudy days. The load profile
+    averages about 70% of total_load, solar_peak is the clear sky peak of the solar profile.
+    """
+    rng = np.random.default_rng(seed)
+
+    Project.site_data.clear()
+    Project.site_data.update({'capital_inflation_rate': 0.0, 'loss_from_failure': 50000000.0, 'loss_during_failure': 82758.62})
+    Project.load_projection.clear()
+    for year in range(1, NUM_YEARS + 1):
+        year_total_load = total_load * (1 + load_growth) ** (year - 1)
+        Project.load_projection[year] = {'critical_load': year_total_load * critical_share, 'total_load': year_total_load}
+
+    hours = np.arange(HOURS_PER_DAY)
+    load_shape = 0.8 + 0.2 * np.sin(np.pi * (hours - 6) / 12).clip(0) + 0.05 * np.cos(2 * np.pi * hours / 24)
+    solar_shape = np.sin(np.pi * (hours - 6) / 12).clip(0)
+
+    Project.load_profile.clear()
+    Project.solar_profile.clear()
+    day_of_year = 0
+    for month, days_in_month in enumerate(DAYS_IN_MONTH, start=1):
+        Project.load_profile[month] = {}
+        Project.solar_profile[month] = {}
+        for day in range(1, days_in_month + 1):
+            season = np.cos(2 * np.pi * (day_of_year - 172) / 365)
+            load = 0.7 * total_load * load_shape * (1 + 0.08 * season) * rng.normal(1, 0.05, HOURS_PER_DAY)
+            solar = solar_peak * solar_shape * (1 + 0.15 * season) * rng.uniform(0.3, 1.0)
+            Project.load_profile[month][day] = load.clip(0).tolist()
+            Project.solar_profile[month][day] = solar.tolist()
+            day_of_year += 1
+    Project.solar_profile_hourly = None
+    Project.load_data.clear()
+    Project.create_load_data()
+
+
+def make_source_manager(num_annual_fails=None, downtime_per_fail=None, solar_sudden_drops=None):
+    # SourceManager holding the synthetic source types. The failure parameters, when given,
+    # replace those of every type (solar_sudden_drops only matters for solar).
+    source_manager = SourceManager()
+    for name, values in SYNTHETIC_SOURCE_TYPES.items():
+        values = dict(values)
+        if num_annual_fails is not None:
+            values['num_annual_fails'] = num_annual_fails
+        if downtime_per_fail is not None:
+            values['downtime_per_fail'] = downtime_per_fail
+        if solar_sudden_drops is not None and values['type'] == 'R':
+            values['solar_sudden_drops'] = solar_sudden_drops
+        source_manager.source_types[name] = parse_source_spec(name, list(values), [None] * len(values), list(values.values()))
+    return source_manager
+
+
+def load_synthetic_data(seed=0, num_annual_fails=None, downtime_per_fail=None, solar_sudden_drops=None, **project_options):
+    # Synthetic counterpart of evaluation.load_prereq_data: fills Project and the source manager the
+    # evaluation functions build sources from.
+    make_project(seed=seed, **project_options)
+    evaluation.source_manager = make_source_manager(num_annual_fails, downtime_per_fail, solar_sudden_drops)
+
+
+def block_slots():
+    # Number of start year genes (maximum unit count) of every source block
+    ends = GENE_BEGIN[1:] + [GENOME_LENGTH]
+    return [end - begin - 2 for begin, end in zip(GENE_BEGIN, ends)]
+
+
+def make_individual(units, bess_units, seed=0):
+    """
+    Chromosome with `units` non BESS units spread over the non BESS blocks (up to the number of
+    slots each has) and `bess_units` BESS units. Start years are random in years 1 to 8, the
+    existing solar plant and the captive sets are there from year 1.
+    """
+    rng = np.random.default_rng(seed)
+    slots = block_slots()
+    quantities = [0] * len(GENE_BEGIN)
+    quantities[2] = min(bess_units, slots[2])
+    # existing solar first, as in every real portfolio, then the others in turn
+    fill_order = [3, 1, 5, 0, 4]
+    remaining = units
+    while remaining > 0 and any(quantities[b] < slots[b] for b in fill_order):
+        for b in fill_order:
+            if remaining > 0 and quantities[b] < slots[b]:
+                quantities[b] += 1
+                remaining -= 1
+
+    individual = ['0'] * GENOME_LENGTH
+    for b, (begin, qty) in enumerate(zip(GENE_BEGIN, quantities)):
+        name = 'SRC_' + str(b + 1)
+        individual[begin] = str(qty)
+        individual[begin + 1] = str(SYNTHETIC_PRIORITIES[name])
+        for slot in range(qty):
+            start_year = 1 if name in ('SRC_4', 'SRC_6') else int(rng.integers(1, 9))
+            individual[begin + 2 + slot] = str(start_year)
+    return individual
+
+
+def make_population(size, units, bess_units, seed=0):
+    # size chromosomes of the same fleet size with different start years
+    return [make_individual(units, bess_units, seed=[seed, n]) for n in range(size)]
@@ -0,0 +1,51 @@
+import numpy as np
+
+# Fixed 12 year horizon of 365 day years, same calendar the simulation has always assumed.
+# Every hour of the run has an absolute index i (0 .. NUM_HOURS-1) in calendar order, so the
+# previous and next hour are simply i-1 and i+1.
+NUM_YEARS = 12
+DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+DAYS_PER_YEAR = sum(DAYS_IN_MONTH)
+HOURS_PER_DAY = 24
+HOURS_PER_YEAR = DAYS_PER_YEAR * HOURS_PER_DAY
+NUM_DAYS = NUM_YEARS * DAYS_PER_YEAR
+NUM_HOURS = NUM_YEARS * HOURS_PER_YEAR
+
+# Day of year (0 based) on which each month starts.
+MONTH_START_DAY = tuple(sum(DAYS_IN_MONTH[:m]) for m in range(12))
+
+# Calendar position of every absolute hour: year and month (1 based), day of month (1 based)
+# and hour of day (0 .. 23).
+_day_of_year = np.arange(DAYS_PER_YEAR)
+_month_of_day = np.repeat(np.arange(1, 13), DAYS_IN_MONTH)
+HOUR_YEAR = np.repeat(np.arange(1, NUM_YEARS + 1), HOURS_PER_YEAR)
+HOUR_MONTH = np.tile(np.repeat(_month_of_day, HOURS_PER_DAY), NUM_YEARS)
+HOUR_DAY = np.tile(np.repeat(_day_of_year - np.array(MONTH_START_DAY)[_month_of_day - 1] + 1, HOURS_PER_DAY), NUM_YEARS)
+HOUR_OF_DAY = np.tile(np.arange(HOURS_PER_DAY), NUM_DAYS)
+
+
+def day_index(y, m, d):
+    return (y - 1) * DAYS_PER_YEAR + MONTH_START_DAY[m - 1] + d - 1
+
+
+def hour_index(y, m, d, h):
+    return day_index(y, m, d) * HOURS_PER_DAY + h
+
+
+def calendar(i):
+    # (year, month, day, hour) of absolute hour i
+    return int(HOUR_YEAR[i]), int(HOUR_MONTH[i]), int(HOUR_DAY[i]), int(HOUR_OF_DAY[i])
+
+
+def year_slice(y):
+    return slice((y - 1) * HOURS_PER_YEAR, y * HOURS_PER_YEAR)
+
+
+def month_days(m):
+    return range(1, DAYS_IN_MONTH[m - 1] + 1)
+
+
+def sum_days_by_month(day_values):
+    # Collapse a per day array (length NUM_DAYS) into a (year, month) table.
+    month_first_days = [y * DAYS_PER_YEAR + start for y in range(NUM_YEARS) for start in MONTH_START_DAY]
+    return np.add.reduceat(day_values, month_first_days).reshape(NUM_YEARS, 12)